@@ -2,14 +2,21 @@ import os
 import requests
 import json
 import pandas as pd
+from cache import get_cache, make_cache_key
+from transport import Transport
+from heuristics import PrelabelStats, ambiguous_columns, merge_labels, prelabel
 
 API_KEY = "xxx"
-API_URL = "https://c-z0-api-01.hash070.com/v1/chat/completions"
+API_URLS = [
+    "https://c-z0-api-01.hash070.com/v1/chat/completions",
+]
 
 HEADERS = {
     "Authorization": f"Bearer {API_KEY}",
 }
 
+TRANSPORT = Transport(API_URLS, HEADERS)
+
 
 def get_java_files(project_dir):
     java_files = []
@@ -47,7 +54,14 @@ def construct_prompt(class_name, class_code):
     return prompt_template.format(class_name=class_name, class_code=class_code)
 
 
-def call_api(prompt, model="gemini-2.5-flash"):
+def call_api(prompt, model="gemini-2.5-flash", use_cache=True):
+    if use_cache:
+        key = make_cache_key(model, None, None, prompt)
+        return get_cache().fetch(key, model, lambda: request_api(prompt, model))
+    return request_api(prompt, model)
+
+
+def request_api(prompt, model="gemini-2.5-flash"):
     params = {
         "messages": [{"role": "user", "content": prompt}],
         "model": model,
@@ -56,22 +70,31 @@ def call_api(prompt, model="gemini-2.5-flash"):
 
     try:
         print("[DEBUG] Sending request...")
-        response = requests.post(
-            API_URL,
-            headers=HEADERS,
-            json=params,
-            timeout=30
-        )
+        response = TRANSPORT.post(json=params, timeout=30)
         response.raise_for_status()
 
         print("[DEBUG] Request successful!")
-        return response.json()
+        return parse_response(response.json())
     except requests.exceptions.RequestException as e:
         print(f"API call failed: {e}")
         return None
 
 
-def main(project_dir, output_excel, model="gemini-2.5-flash"):
+# Decode the labels JSON from the reply; None (never cached) when the content is unusable
+def parse_response(response_json):
+    try:
+        res_content = response_json["choices"][0]["message"]["content"]
+        res_content = res_content.strip()
+        if res_content.startswith('```json') and res_content.endswith('```'):
+            res_content = res_content[8:-3].strip()
+        tool_dict = json.loads(res_content)
+        return tool_dict if isinstance(tool_dict, dict) else None
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        print(f"Error parsing response: {e}")
+        return None
+
+
+def main(project_dir, output_excel, model="gemini-2.5-flash", use_cache=True, prelabel_mode=True):
     java_files = get_java_files(project_dir)
 
     columns = ["class_name", "String processing", "File operations", "Network communication",
@@ -80,21 +103,28 @@ def main(project_dir, output_excel, model="gemini-2.5-flash"):
                "Concurrency and Multithreading", "Exception handling"]
 
     results = []
+    prelabel_stats = PrelabelStats()
 
     for file_path in java_files:
         class_name = get_class_name(file_path)
         class_code = read_file_content(file_path)
+        # Labels readable straight off imports/keywords are filled in; the LLM is only asked if some remain
+        heuristic = prelabel(class_code) if prelabel_mode else None
+        if heuristic and not ambiguous_columns(heuristic):
+            prelabel_stats.record(heuristic, None)
+            results.append([class_name] + [heuristic[column][0] for column in columns[1:]])
+            continue
+
         prompt = construct_prompt(class_name, class_code)
-        response = call_api(prompt, model)
+        tool_dict = call_api(prompt, model, use_cache)
 
-        if response:
+        if tool_dict:
             try:
-                res_content = response["choices"][0]["message"]["content"]
-                res_content = res_content.strip()
-                if res_content.startswith('```json') and res_content.endswith('```'):
-                    res_content = res_content[8:-3].strip()
-
-                tool_dict = json.loads(res_content)
+                if heuristic:
+                    prelabel_stats.record(heuristic, tool_dict)
+                    merged = merge_labels(heuristic, tool_dict)
+                    results.append([tool_dict.get("class_name", class_name)] + [merged[c] for c in columns[1:]])
+                    continue
 
                 result_row = [
                     tool_dict["class_name"],
@@ -127,9 +157,19 @@ def main(project_dir, output_excel, model="gemini-2.5-flash"):
     else:
         print("No results to save")
 
+    if prelabel_mode:
+        prelabel_stats.print_report()
+    if use_cache:
+        get_cache().print_stats()
+    TRANSPORT.print_stats()
+
 
 if __name__ == "__main__":
     project_dir = "E:\\unit-generate\\jfreechart154\\src\\main\\java\\org\\jfree"
     output_excel = "codersence.xlsx"
     model = "gemini-2.5-flash"
-    main(project_dir, output_excel, model)
\ No newline at end of file
+    # Set USE_CACHE = False to re-query every class instead of reusing llm_cache.sqlite
+    USE_CACHE = True
+    # Set PRELABEL = False to send every class to the LLM instead of filling obvious labels from the code
+    PRELABEL = True
+    main(project_dir, output_excel, model, USE_CACHE, PRELABEL)
\ No newline at end of file
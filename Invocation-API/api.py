@@ -1,18 +1,80 @@
 import os
+import re
+import sys
 import requests
 import json
-import pandas as pd
 import time
-from typing import Dict, List, Any, Optional, Tuple
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Any, Optional, Tuple, Union
 from dataclasses import dataclass
+from cache import get_cache, make_cache_key
+from journal import ResultJournal, DEFAULT_JOURNAL_PATH
+from ingest import DEFAULT_EXCLUDE, DEFAULT_INCLUDE, DEFAULT_MANIFEST_PATH, Manifest, scan_project, write_change_list
+from transport import Transport
+from compaction import COMPACTION_LEVELS, CompactionStats, compact_java, estimate_tokens
+from ratelimit import get_limiter, interleave_by_size
+from retry import PARSE, RetryPolicy, classify_exception, get_breaker, parse_retry_after
+from telemetry import Telemetry
+from streaming import read_verdict_stream
+from dedup import file_signature, get_index
+from metrics_prompt import METRICS_PROMPT, get_lookup, package_name
+from repair import RepairStats, construct_repair_prompt, mentions_answer, response_schema, tolerant_loads
+from batching import BatchItem, batch_entries, construct_batch_prompt, match_batch_results, pack_batches, parse_batch_content
 
 API_KEY = "xxx"
-API_URL = "https://cn2us02.opapi.win/v1/chat/completions"
+# Equivalent endpoints; requests are routed to the fastest healthy one
+API_URLS = [
+    "https://cn2us02.opapi.win/v1/chat/completions",
+]
 
 HEADERS = {
     "Authorization": f"Bearer {API_KEY}",
 }
 
+TRANSPORT = Transport(API_URLS, HEADERS)
+
+# Per-request latency, token usage and outcome records, exported at the end of main()
+TELEMETRY = Telemetry()
+TELEMETRY_CSV = "telemetry.csv"
+TELEMETRY_PROM = "telemetry.prom"
+
+# Stream single-class responses and hang up as soon as the verdict JSON is complete
+STREAM_MODE = False
+
+# Reuse the verdict of an already classified near-identical class (MinHash/LSH over token shingles)
+DEDUP_MODE = False
+NEAR_DUP_THRESHOLD = 0.9
+
+# "inline" sends prompt.txt as a single user message with the class code near the top. "prefix" moves
+# the static instructions into a system message and sends the class last, so the provider can
+# cache the shared prefix and each class only pays full price for its own code.
+PROMPT_LAYOUT = "inline"
+PROMPT_LAYOUTS = ["inline", "prefix"]
+CLASS_SECTION = re.compile(r"Here is a Java class named \{class_name\}:\s*\{class_code\}\s*")
+CLASS_MESSAGE = "Here is a Java class named {class_name}:\n\n{class_code}"
+
+# Template for classes without precomputed metrics
+PROMPT_FILE = "prompt.txt"
+# Metric-augmented mode: a metrics workbook (e.g. data/symtrain.xlsx) whose row for the class is sent
+# after the code with prompt-metrics.txt, so the model only gives the verdict. None disables it.
+METRICS_PATH = None
+
+# A prompt is either a single user message or a list of chat messages
+Prompt = Union[str, List[Dict[str, str]]]
+
+# Self-consistency: sample each verdict this many times and keep the majority (1 = single sample)
+SELF_CONSISTENCY_SAMPLES = 1
+
+# Recover malformed JSON locally, then with a small repair request quoting only the bad output,
+# before falling back to resending the whole class prompt
+JSON_REPAIR = True
+REPAIR_STATS = RepairStats()
+
+# Backoff between attempts; a per-model circuit breaker pauses all workers under throttling
+RETRY_POLICY = RetryPolicy()
+
 
 @dataclass
 class ModelConfig:
@@ -22,18 +84,52 @@ class ModelConfig:
     max_tokens: int = 2048
     temperature: float = 0.7
     supports_json_mode: bool = False
+    max_concurrency: int = 4
+    batch_token_budget: int = 6000
+    rpm: int = 0  # Requests per minute quota, 0 = unlimited
+    tpm: int = 0  # Tokens per minute quota (prompt + completion), 0 = unlimited
+    supports_logprobs: bool = False
+    supports_n: bool = False  # Several completions per request via the "n" parameter
+    prompt_price: float = 0.0  # USD per 1M prompt tokens
+    completion_price: float = 0.0  # USD per 1M completion tokens
 
 
 # Supported model configurations
 SUPPORTED_MODELS = {
     # OpenAI
-    "gpt-3.5-turbo": ModelConfig("gpt-3.5-turbo", "openai", 2048, 0.7, True),
-    "gpt-4o-mini-2024-07-18": ModelConfig("gpt-4o-mini-2024-07-18", "openai", 12288, 0.5, True),
+    "gpt-3.5-turbo": ModelConfig("gpt-3.5-turbo", "openai", 2048, 0.7, True,
+                                 batch_token_budget=6000, rpm=3500, tpm=160000,
+                                 supports_logprobs=True, supports_n=True, prompt_price=0.5, completion_price=1.5),
+    "gpt-4o-mini-2024-07-18": ModelConfig("gpt-4o-mini-2024-07-18", "openai", 12288, 0.5, True,
+                                          batch_token_budget=24000, rpm=5000, tpm=2000000,
+                                          supports_logprobs=True, supports_n=True,
+                                          prompt_price=0.15, completion_price=0.6),
 
     # Google Gemini
-    "gemini-2.5-flash-lite-preview-06-17": ModelConfig("gemini-2.5-flash-lite-preview-06-17", "google", 12288, 0.5, False),
+    "gemini-2.5-flash-lite-preview-06-17": ModelConfig("gemini-2.5-flash-lite-preview-06-17", "google", 12288, 0.5, False,
+                                                       batch_token_budget=24000, rpm=4000, tpm=4000000,
+                                                       prompt_price=0.1, completion_price=0.4),
 }
 
+# Completion tokens reserved from the TPM quota per request until the real usage is known
+EXPECTED_COMPLETION_TOKENS = 256
+
+# Allowed "tool" values; a reply without one of them is not a verdict and is never cached
+TOOLS = ["LLM", "Evosuite"]
+
+
+# Files picked up from each project directory; globs match '/'-separated paths relative to it
+INCLUDE_GLOBS = DEFAULT_INCLUDE
+EXCLUDE_GLOBS = DEFAULT_EXCLUDE
+# Incremental runs record path/size/mtime/hash here and only re-classify new or changed files
+MANIFEST_PATH = DEFAULT_MANIFEST_PATH
+CHANGED_FILES_LIST = "changed_files.txt"
+
+# Java source compaction applied before prompt construction, one of COMPACTION_LEVELS:
+# "none", "imports" (license/package/imports), "comments" (+ all comments), "skeleton" (+ simple method bodies)
+COMPACTION_LEVEL = "none"
+COMPACTION_STATS = CompactionStats()
+
 
 def get_available_models() -> List[str]:
     return list(SUPPORTED_MODELS.keys())
@@ -56,12 +152,8 @@ def print_available_models():
 
 
 def get_java_files(project_dir):
-    java_files = []
-    for root, dirs, files in os.walk(project_dir):
-        for file in files:
-            if file.endswith(".java"):
-                java_files.append(os.path.join(root, file))
-    return java_files
+    return [os.path.join(project_dir, *rel.split("/"))
+            for rel in sorted(scan_project(project_dir, INCLUDE_GLOBS, EXCLUDE_GLOBS))]
 
 
 # Extract class name from file path
@@ -76,25 +168,51 @@ def read_file_content(file_path):
 
 
 # Read prompt template from local file
-def read_prompt_template() -> str:
+def read_prompt_template(file_name: str = "prompt.txt") -> str:
     try:
-        with open("prompt.txt", "r", encoding="utf-8") as f:
+        with open(file_name, "r", encoding="utf-8") as f:
             return f.read().strip()
     except FileNotFoundError:
-        print("Error: prompt.txt file not found in the current directory")
+        print(f"Error: {file_name} file not found in the current directory")
         exit(1)
     except Exception as e:
-        print(f"Error reading prompt.txt: {e}")
+        print(f"Error reading {file_name}: {e}")
         exit(1)
 
 
-# Construct prompt using template
-def construct_prompt(class_name: str, class_code: str) -> str:
-    template = read_prompt_template()
+# Construct prompt using template, laid out according to PROMPT_LAYOUT.
+# With METRICS_PATH, classes that have a metrics row get the metric-augmented template instead;
+# `package` comes from the uncompacted source (see load_class), as compaction drops the declaration.
+def construct_prompt(class_name: str, class_code: str, package: Optional[str] = None) -> Prompt:
+    template_file = PROMPT_FILE
+    if METRICS_PATH:
+        table = get_lookup(METRICS_PATH).table(class_name, package or package_name(class_code))
+        if table:
+            template_file = METRICS_PROMPT
+            class_code = f"{class_code}\n\n{table}"
+    template = read_prompt_template(template_file)
+    if PROMPT_LAYOUT == "prefix":
+        return construct_prefix_messages(template, class_name, class_code)
     return template.format(class_name=class_name, class_code=class_code)
 
 
-def construct_api_params(prompt: str, model_name: str) -> Dict[str, Any]:
+def construct_prefix_messages(template: str, class_name: str, class_code: str) -> List[Dict[str, str]]:
+    """Identical system message for every class, then the class itself as the last message"""
+    instructions, found = CLASS_SECTION.subn("", template, count=1)
+    if not found:
+        raise ValueError("Prompt template has no 'Here is a Java class named {class_name}:' section to move")
+    # The response format names the class; it is left generic so the system message never varies
+    system = instructions.strip().format(class_name="<class name>", class_code="")
+    return [{"role": "system", "content": system},
+            {"role": "user", "content": CLASS_MESSAGE.format(class_name=class_name, class_code=class_code)}]
+
+
+def prompt_text(prompt: Prompt) -> str:
+    return prompt if isinstance(prompt, str) else "\n".join(message["content"] for message in prompt)
+
+
+def construct_api_params(prompt: Prompt, model_name: str, json_mode: bool = True,
+                         stream: bool = False, logprobs: bool = False, n: int = 1) -> Dict[str, Any]:
     if model_name not in SUPPORTED_MODELS:
         raise ValueError(f"Model not supported: {model_name}")
 
@@ -103,129 +221,531 @@ def construct_api_params(prompt: str, model_name: str) -> Dict[str, Any]:
     # Base parameters
     params = {
         "model": config.name,
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt,
         "max_tokens": config.max_tokens,
         "temperature": config.temperature,
-        "stream": False
+        "stream": stream
     }
 
     # Add response format if model supports JSON mode
-    if config.supports_json_mode:
+    if json_mode and config.supports_json_mode:
         params["response_format"] = {"type": "json_object"}
 
+    # Token log-probabilities, used as a confidence signal by cascade.py
+    if logprobs and config.supports_logprobs:
+        params["logprobs"] = True
+
+    if n > 1 and config.supports_n:
+        params["n"] = n
+
+    # OpenAI-compatible endpoints only report token usage of a stream in a final chunk when asked
+    if stream:
+        params["stream_options"] = {"include_usage": True}
+
     return params
 
 
-def parse_response(response_json: Dict[str, Any], model_name: str) -> Optional[Dict[str, Any]]:
-    try:
-        config = SUPPORTED_MODELS[model_name]
+# Get response content based on provider
+def extract_content(response_json: Dict[str, Any], model_name: str) -> str:
+    config = SUPPORTED_MODELS[model_name]
 
-        # Get response content based on provider
-        if config.provider in ["openai", "qwen"]:
-            content = response_json["choices"][0]["message"]["content"]
-        elif config.provider == "anthropic":
-            content = response_json["content"][0]["text"] if "content" in response_json else \
+    if config.provider in ["openai", "qwen"]:
+        return response_json["choices"][0]["message"]["content"]
+    elif config.provider == "anthropic":
+        return response_json["content"][0]["text"] if "content" in response_json else \
             response_json["choices"][0]["message"]["content"]
-        elif config.provider == "google":
-            content = response_json["candidates"][0]["content"]["parts"][0]["text"] if "candidates" in response_json else \
+    elif config.provider == "google":
+        return response_json["candidates"][0]["content"]["parts"][0]["text"] if "candidates" in response_json else \
             response_json["choices"][0]["message"]["content"]
-        else:
-            content = response_json["choices"][0]["message"]["content"]
+    else:
+        return response_json["choices"][0]["message"]["content"]
+
+
+# Normalise OpenAI "usage" and Gemini "usageMetadata" blocks to prompt/completion/total tokens
+def extract_usage(response_json: Dict[str, Any]) -> Dict[str, Any]:
+    """Token usage in OpenAI terms, including prompt tokens served from the provider's prefix cache"""
+    if response_json.get("usage"):
+        usage = dict(response_json["usage"])
+        usage["cached_tokens"] = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+        return usage
+    metadata = response_json.get("usageMetadata") or {}
+    if not metadata:
+        return {}
+    return {
+        "prompt_tokens": metadata.get("promptTokenCount"),
+        "completion_tokens": metadata.get("candidatesTokenCount"),
+        "total_tokens": metadata.get("totalTokenCount"),
+        "cached_tokens": metadata.get("cachedContentTokenCount", 0)
+    }
+
+
+def parse_response(response_json: Dict[str, Any], model_name: str) -> Optional[Dict[str, Any]]:
+    try:
+        content = extract_content(response_json, model_name)
 
         # Parse JSON content
-        if content.strip().startswith("{"):
-            return json.loads(content)
-        else:
-            import re
-            json_match = re.search(r'\{.*?\}', content, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
+        parsed = None
+        try:
+            if content.strip().startswith("{"):
+                parsed = json.loads(content)
             else:
-                print(f"Response content cannot be parsed as JSON: {content}")
-                return None
+                json_match = re.search(r'\{.*?\}', content, re.DOTALL)
+                if json_match:
+                    parsed = json.loads(json_match.group())
+        except json.JSONDecodeError:
+            pass
+        if is_verdict(parsed):
+            return parsed
+
+        # Fences, trailing commas, single quotes or a truncated object; only a complete verdict counts
+        repaired = tolerant_loads(content) if JSON_REPAIR else None
+        if is_verdict(repaired):
+            REPAIR_STATS.record_local()
+            print(f"Repaired malformed JSON locally")
+            return repaired
+        print(f"Response content has no valid tool verdict: {content}")
+        return None
 
     except Exception as e:
         print(f"Error parsing response: {e}")
         return None
 
 
-def call_api(prompt: str, model: str = "gpt-3.5-turbo", max_retries: int = 4) -> Optional[Dict[str, Any]]:
-    """Call API with multiple model support"""
+def is_verdict(response: Any) -> bool:
+    return isinstance(response, dict) and response.get("tool") in TOOLS
+
+
+def parse_samples(response_json: Dict[str, Any], model_name: str) -> Optional[List[Dict[str, Any]]]:
+    """One verdict per returned choice of an n > 1 request"""
+    verdicts = [parse_response({"choices": [choice]}, model_name) for choice in response_json.get("choices", [])]
+    verdicts = [verdict for verdict in verdicts if verdict]
+    return verdicts or None
+
+
+def parse_batch_response(response_json: Dict[str, Any], model_name: str) -> Optional[List[Dict[str, Any]]]:
+    try:
+        content = extract_content(response_json, model_name)
+        results = parse_batch_content(content)
+        if not results and JSON_REPAIR:
+            # A truncated array keeps its complete entries; match_batch_results retries the rest
+            results = batch_entries(tolerant_loads(content))
+            if results:
+                REPAIR_STATS.record_local()
+                print(f"Repaired malformed batch JSON locally ({len(results)} entries recovered)")
+        return results
+    except Exception as e:
+        print(f"Error parsing batch response: {e}")
+        return None
+
+
+def call_api(prompt: Prompt, model: str = "gpt-3.5-turbo", max_retries: int = 4, use_cache: bool = True,
+             parser: Callable[[Dict[str, Any], str], Any] = parse_response, json_mode: bool = True,
+             logprobs: bool = False, n: int = 1, cache_variant: str = "") -> Optional[Any]:
+    """Call API with multiple model support, answering from the response cache when possible"""
     if model not in SUPPORTED_MODELS:
         print(f"Error: Model '{model}' is not supported")
         print_available_models()
         return None
 
+    if not use_cache:
+        return request_with_retries(prompt, model, max_retries, parser, json_mode, logprobs, n)
+
+    config = SUPPORTED_MODELS[model]
+    key = make_cache_key(config.name, config.temperature, config.max_tokens, prompt,
+                         cache_variant or (f"n={n}" if n > 1 else ""))
+    return get_cache().fetch(key, config.name,
+                             lambda: request_with_retries(prompt, model, max_retries, parser, json_mode, logprobs, n))
+
+
+def get_model_limiter(model: str):
+    config = SUPPORTED_MODELS[model]
+    return get_limiter(config.name, config.rpm, config.tpm)
+
+
+def request_with_retries(prompt: Prompt, model: str, max_retries: int = 4,
+                         parser: Callable[[Dict[str, Any], str], Any] = parse_response,
+                         json_mode: bool = True, logprobs: bool = False, n: int = 1,
+                         repair: bool = True) -> Optional[Any]:
+    breaker = get_breaker(model)
+    limiter = get_model_limiter(model)
+    estimated_tokens = estimate_tokens(prompt_text(prompt)) + EXPECTED_COMPLETION_TOKENS * n
+
     for attempt in range(max_retries):
+        retry_after = None
+        endpoint, status_code, usage = None, None, None
+        malformed = None
+        start = time.perf_counter()
         try:
-            params = construct_api_params(prompt, model)
+            breaker.wait()
+            limiter.acquire(estimated_tokens)
+            # Only single verdict objects can be cut off early; batch arrays need the whole reply
+            stream = STREAM_MODE and parser is parse_response
+            params = construct_api_params(prompt, model, json_mode, stream, logprobs, n)
             print(f"[DEBUG] Sending request to {model} (attempt {attempt + 1}/{max_retries})...")
 
-            response = requests.post(
-                API_URL,
-                headers=HEADERS,
-                json=params,
-                timeout=30
-            )
+            start = time.perf_counter()
+            response = TRANSPORT.post(json=params, timeout=30, stream=stream)
+            endpoint, status_code = response.url, response.status_code
+            if response.status_code >= 400:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
             response.raise_for_status()
             print("[DEBUG] Request successful!")
-
-            res_json = response.json()
-            tool_dict = parse_response(res_json, model)
+            breaker.record_success()
+
+            time_to_verdict, streamed_verdict = None, None
+            if stream:
+                streamed = read_verdict_stream(response, start)
+                time_to_verdict, streamed_verdict = streamed.time_to_verdict, streamed.verdict
+                # Early termination skips the final usage chunk; estimate what was sent and received
+                usage = dict(streamed.usage or {})
+                if usage.get("prompt_tokens") is None or usage.get("total_tokens") is None:
+                    if usage.get("prompt_tokens") is None:
+                        usage["prompt_tokens"] = estimate_tokens(prompt_text(prompt))
+                    if usage.get("completion_tokens") is None:
+                        usage["completion_tokens"] = estimate_tokens(streamed.content)
+                    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                res_json = {"choices": [{"message": {"content": streamed.content}}], "usage": usage}
+            else:
+                res_json = response.json()
+            usage = extract_usage(res_json)
+            limiter.settle(estimated_tokens, usage.get("total_tokens"))
+            tool_dict = streamed_verdict if is_verdict(streamed_verdict) else parser(res_json, model)
 
             if tool_dict:
+                TELEMETRY.record(model, endpoint, attempt + 1, time.perf_counter() - start, "ok", status_code, usage,
+                                 time_to_verdict)
                 return tool_dict
             else:
                 print(f"Failed to extract valid JSON from response")
+                kind = PARSE
+                try:
+                    malformed = extract_content(res_json, model)
+                except (KeyError, IndexError, TypeError):
+                    pass
 
         except requests.exceptions.RequestException as e:
-            print(f"Network request failed (attempt {attempt + 1}/{max_retries}): {e}")
+            kind = classify_exception(e)
+            endpoint = endpoint or getattr(e.request, "url", None)
+            print(f"Network request failed ({kind}, attempt {attempt + 1}/{max_retries}): {e}")
         except json.JSONDecodeError as e:
+            kind = PARSE
             print(f"JSON parsing failed (attempt {attempt + 1}/{max_retries}): {e}")
         except Exception as e:
+            kind = classify_exception(e)
             print(f"API call failed (attempt {attempt + 1}/{max_retries}): {e}")
 
+        TELEMETRY.record(model, endpoint, attempt + 1, time.perf_counter() - start, kind, status_code, usage)
+        if malformed and repair and JSON_REPAIR:
+            repaired = request_repair(prompt, malformed, model, parser, json_mode)
+            if repaired:
+                return repaired
+        breaker.record_failure(kind, retry_after)
+        if not RETRY_POLICY.should_retry(kind):
+            print(f"Non-retryable {kind} error. Skipping this request")
+            return None
+
         if attempt < max_retries - 1:
-            time.sleep(2)
+            delay = RETRY_POLICY.delay(attempt, kind, retry_after)
+            print(f"[DEBUG] Retrying in {delay:.1f}s ({kind})")
+            time.sleep(delay)
 
     print(f"All retries exhausted. Skipping this request")
     return None
 
 
+def request_repair(prompt: Prompt, malformed: str, model: str,
+                   parser: Callable[[Dict[str, Any], str], Any] = parse_response,
+                   json_mode: bool = True) -> Optional[Any]:
+    """Ask the model to reformat its own malformed output; the class source is not resent"""
+    schema = response_schema(prompt)
+    if not mentions_answer(malformed, schema):
+        # Nothing to reformat (e.g. cut off before the verdict): only the full prompt can answer
+        return None
+    repair_prompt = construct_repair_prompt(malformed, schema)
+    print(f"[DEBUG] Sending JSON repair request ({estimate_tokens(repair_prompt)} tokens)...")
+    repaired = request_with_retries(repair_prompt, model, 1, parser, json_mode, repair=False)
+    REPAIR_STATS.record_reask(estimate_tokens(repair_prompt), estimate_tokens(prompt_text(prompt)),
+                              repaired is not None)
+    return repaired
+
+
+# Read a Java file and apply the configured source compaction
+def load_class_code(file_path: str) -> str:
+    return load_class(file_path)[0]
+
+
+# Compacted class code and the package declared in the original source
+def load_class(file_path: str) -> Tuple[str, Optional[str]]:
+    source = read_file_content(file_path)
+    compacted = compact_java(source, COMPACTION_LEVEL)
+    COMPACTION_STATS.add(compacted)
+    return compacted.code, package_name(source)
+
+
+def sample_verdicts(prompt: Prompt, model: str, samples: int, use_cache: bool = True) -> List[Dict[str, Any]]:
+    """Up to `samples` independent verdicts for one prompt.
+
+    Models with supports_n get them from a single n=samples request, so the prompt
+    is sent and billed once. Otherwise, or when a proxy returns fewer choices, the
+    rest come from concurrent single requests of the identical prompt, each with
+    its own cache slot.
+    """
+    config = SUPPORTED_MODELS[model]
+    verdicts = []
+    if config.supports_n:
+        verdicts = call_api(prompt, model, use_cache=use_cache, parser=parse_samples, n=samples) or []
+    missing = range(len(verdicts), samples)
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(len(missing), config.max_concurrency)) as executor:
+            extra = executor.map(lambda i: call_api(prompt, model, use_cache=use_cache, cache_variant=f"sample={i}"),
+                                 missing)
+            verdicts += [verdict for verdict in extra if verdict and "tool" in verdict]
+    return verdicts
+
+
+def majority_vote(verdicts: List[Dict[str, Any]]) -> Tuple[Optional[str], Dict[str, int]]:
+    """Most frequent tool (first seen wins a tie) and the vote count per tool"""
+    votes = Counter(verdict["tool"] for verdict in verdicts)
+    return (votes.most_common(1)[0][0] if votes else None), dict(votes)
+
+
+# Classify one class from its source, returning [class_name, tool] or None
+def classify_code(class_name: str, class_code: str, model: str = "gpt-3.5-turbo",
+                  use_cache: bool = True, package: Optional[str] = None) -> Optional[List[Any]]:
+    prompt = construct_prompt(class_name, class_code, package)
+    if SELF_CONSISTENCY_SAMPLES > 1:
+        return classify_self_consistent(class_name, prompt, model, use_cache)
+    response = call_api(prompt, model, use_cache=use_cache)
+
+    if response:
+        try:
+            print(f"  Successfully parsed {class_name} -> {response['tool']}")
+            return [response["class_name"], response["tool"]]
+        except KeyError as e:
+            print(f"  Failed to parse {class_name}: Response missing required field: {e}")
+        except Exception as e:
+            print(f"  Error parsing {class_name}: {e}")
+    else:
+        print(f"  Skipping {class_name} due to empty or invalid response")
+    return None
+
+
+# Majority verdict over SELF_CONSISTENCY_SAMPLES samples; the vote split is kept for the journal
+def classify_self_consistent(class_name: str, prompt: Prompt, model: str, use_cache: bool = True) -> Optional[List[Any]]:
+    verdicts = sample_verdicts(prompt, model, SELF_CONSISTENCY_SAMPLES, use_cache)
+    tool, votes = majority_vote(verdicts)
+    if tool is None:
+        print(f"  Skipping {class_name} due to empty or invalid response")
+        return None
+    split = ", ".join(f"{t}={c}" for t, c in votes.items())
+    print(f"  Successfully parsed {class_name} -> {tool} (votes: {split})")
+    return [verdicts[0].get("class_name", class_name), tool,
+            {"source": "llm", "votes": votes, "agreement": round(votes[tool] / len(verdicts), 3)}]
+
+
+# Classify a single Java file, returning [class_name, tool] or None.
+# A verdict reused from a near-duplicate carries its provenance as a third element.
+def classify_file(file_path: str, model: str = "gpt-3.5-turbo", use_cache: bool = True) -> Optional[List[Any]]:
+    class_name = get_class_name(file_path)
+
+    try:
+        if DEDUP_MODE:
+            index = get_index(model, NEAR_DUP_THRESHOLD)
+            signature, _ = file_signature(index, file_path)
+            match = index.query(signature, exclude=file_path)
+            if match:
+                print(f"  Reusing {class_name} -> {match.tool} from near-duplicate "
+                      f"{get_class_name(match.key)} (similarity {match.similarity:.2f})")
+                return [class_name, match.tool, {"source": "near-duplicate", "source_file": match.key,
+                                                 "similarity": round(match.similarity, 3)}]
+
+        class_code, package = load_class(file_path)
+        row = classify_code(class_name, class_code, model, use_cache, package)
+        if DEDUP_MODE and row:
+            index.add(file_path, signature, row[1])
+        return row
+    except Exception as e:
+        print(f"  Error processing file {class_name}: {e}")
+
+    return None
+
+
+def get_project_name(project_dir: str) -> str:
+    return os.path.basename(os.path.normpath(project_dir))
+
+
+# List (index, path) of files still to classify, skipping those already in the journal
+def get_pending_files(java_files: List[str], project_name: str, model: str,
+                      journal: Optional[ResultJournal] = None) -> List[Tuple[int, str]]:
+    pending = list(enumerate(java_files))
+    if journal:
+        done = journal.completed_files(project_name, model)
+        pending = [(index, path) for index, path in pending if path not in done]
+        if done:
+            print(f"Resuming: {len(java_files) - len(pending)} classes already in journal {journal.path}")
+    return pending
+
+
+def record_result(journal: Optional[ResultJournal], project_name: str, model: str,
+                  index: int, file_path: str, row: Optional[List[Any]]):
+    if journal and row:
+        record = {"project": project_name, "model": model, "index": index, "file": file_path,
+                  "class_name": row[0], "tool": row[1]}
+        record.update(row[2] if len(row) > 2 else {"source": "llm"})
+        journal.append(record)
+
+
+def seed_near_duplicate_index(journal: ResultJournal, model: str):
+    """Index the LLM verdicts of every class in the journal that still exists on disk"""
+    index = get_index(model, NEAR_DUP_THRESHOLD)
+    latest = {r["file"]: r for r in journal.load()
+              if r.get("model") == model and r.get("tool") and r.get("source", "llm") == "llm"}
+    for file_path, r in latest.items():
+        if os.path.exists(file_path):
+            index.add(file_path, file_signature(index, file_path)[0], r["tool"])
+    print(f"Near-duplicate index seeded with {len(index.signatures)} classes from {journal.path}")
+
+
 # Process a single project
-def process_project(project_dir: str, model: str = "gpt-3.5-turbo") -> Tuple[List[List[str]], str]:
+def process_project(project_dir: str, model: str = "gpt-3.5-turbo", use_cache: bool = True,
+                    journal: Optional[ResultJournal] = None) -> Tuple[List[List[str]], str]:
     java_files = get_java_files(project_dir)
+    project_name = get_project_name(project_dir)
     results = []
 
     print(f"Found {len(java_files)} Java files in project directory")
 
-    for i, file_path in enumerate(java_files, 1):
-        class_name = get_class_name(file_path)
-        print(f"Processing file {i}/{len(java_files)}: {class_name}")
+    pending = get_pending_files(java_files, project_name, model, journal)
+    progress = TELEMETRY.progress(project_name, len(pending), model)
+    for index, file_path in pending:
+        print(f"Processing file {index + 1}/{len(java_files)}: {get_class_name(file_path)}")
+        row = classify_file(file_path, model, use_cache)
+        record_result(journal, project_name, model, index, file_path, row)
+        progress.tick(get_class_name(file_path))
+        if row:
+            results.append(row)
 
-        try:
-            class_code = read_file_content(file_path)
-            prompt = construct_prompt(class_name, class_code)
-            response = call_api(prompt, model)
+    # Return results and project name
+    return results, project_name
 
-            if response:
-                try:
-                    results.append([response["class_name"], response["tool"]])
-                    print(f"  Successfully parsed {class_name} -> {response['tool']}")
-                except KeyError as e:
-                    print(f"  Failed to parse {class_name}: Response missing required field: {e}")
-                except Exception as e:
-                    print(f"  Error parsing {class_name}: {e}")
-            else:
-                print(f"  Skipping {class_name} due to empty or invalid response")
-        except Exception as e:
-            print(f"  Error processing file {class_name}: {e}")
 
-    # Return results and project name
-    project_name = os.path.basename(os.path.normpath(project_dir))
+async def process_project_async(project_dir: str, model: str = "gpt-3.5-turbo",
+                                concurrency: Optional[int] = None, use_cache: bool = True,
+                                journal: Optional[ResultJournal] = None) -> Tuple[List[List[str]], str]:
+    """Process a project keeping up to `concurrency` requests in flight.
+
+    Each file still goes through the blocking `call_api` (and its retry loop) on a
+    worker thread, so behaviour per class is identical to `process_project`.
+    Results are returned in the original file order.
+    """
+    if model not in SUPPORTED_MODELS:
+        raise ValueError(f"Model not supported: {model}")
+
+    limit = concurrency or SUPPORTED_MODELS[model].max_concurrency
+    java_files = get_java_files(project_dir)
+    project_name = get_project_name(project_dir)
+    # Dispatch big and small classes alternately so large prompts don't hit the TPM quota together
+    pending = interleave_by_size(get_pending_files(java_files, project_name, model, journal),
+                                 lambda job: os.path.getsize(job[1]))
+    semaphore = asyncio.Semaphore(limit)
+    loop = asyncio.get_running_loop()
+    progress = TELEMETRY.progress(project_name, len(pending), model)
+
+    print(f"Found {len(java_files)} Java files in project directory (concurrency: {limit})")
+
+    async def worker(index: int, file_path: str, executor: ThreadPoolExecutor) -> Optional[List[str]]:
+        async with semaphore:
+            row = await loop.run_in_executor(executor, classify_file, file_path, model, use_cache)
+        record_result(journal, project_name, model, index, file_path, row)
+        progress.tick(get_class_name(file_path))
+        return row
+
+    with ThreadPoolExecutor(max_workers=limit) as executor:
+        rows = await asyncio.gather(*(worker(index, path, executor) for index, path in pending))
+
+    results = [row for _, row in sorted(zip((index for index, _ in pending), rows)) if row]
     return results, project_name
 
 
+def classify_batch(items: List[BatchItem], model: str, template: str,
+                   use_cache: bool = True) -> Tuple[Dict[int, List[str]], int]:
+    """Classify a packed batch in one request; classes missing from the reply are retried alone.
+
+    Returns ({file index: [class_name, tool]}, number of individual retries).
+    """
+    if len(items) == 1:
+        row = classify_code(items[0].class_name, items[0].class_code, model, use_cache)
+        return ({items[0].index: row} if row else {}), 0
+
+    print(f"[DEBUG] Sending batch of {len(items)} classes: {', '.join(it.class_name for it in items)}")
+    verdicts = call_api(construct_batch_prompt(template, items), model, use_cache=use_cache,
+                        parser=parse_batch_response, json_mode=False)
+    results, missing = match_batch_results(items, verdicts)
+    for index, row in results.items():
+        print(f"  Successfully parsed {row[0]} -> {row[1]}")
+
+    for item in missing:
+        print(f"  {item.class_name} missing from batch response, retrying individually")
+        row = classify_code(item.class_name, item.class_code, model, use_cache)
+        if row:
+            results[item.index] = row
+    return results, len(missing)
+
+
+def process_project_batched(project_dir: str, model: str = "gpt-3.5-turbo", use_cache: bool = True,
+                            journal: Optional[ResultJournal] = None,
+                            concurrency: int = 1) -> Tuple[List[List[str]], str]:
+    """Pack several classes into each request, up to the model's batch_token_budget"""
+    if model not in SUPPORTED_MODELS:
+        raise ValueError(f"Model not supported: {model}")
+
+    java_files = get_java_files(project_dir)
+    project_name = get_project_name(project_dir)
+    template = read_prompt_template("prompt-batch.txt")
+    budget = SUPPORTED_MODELS[model].batch_token_budget - estimate_tokens(template)
+
+    items = []
+    for index, file_path in get_pending_files(java_files, project_name, model, journal):
+        try:
+            items.append(BatchItem(index, file_path, get_class_name(file_path), load_class_code(file_path)))
+        except Exception as e:
+            print(f"  Error processing file {get_class_name(file_path)}: {e}")
+
+    batches = interleave_by_size(pack_batches(items, budget), lambda batch: sum(it.tokens for it in batch))
+    print(f"Found {len(java_files)} Java files in project directory, "
+          f"packed {len(items)} classes into {len(batches)} requests (budget: {budget} tokens)")
+
+    progress = TELEMETRY.progress(project_name, len(items), model)
+
+    def run_batch(batch: List[BatchItem]) -> Tuple[Dict[int, List[str]], int]:
+        rows, retried = classify_batch(batch, model, template, use_cache)
+        for item in batch:
+            record_result(journal, project_name, model, item.index, item.file_path, rows.get(item.index))
+            progress.tick(item.class_name)
+        return rows, retried
+
+    results, retried = {}, 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for rows, batch_retried in executor.map(run_batch, batches):
+            results.update(rows)
+            retried += batch_retried
+
+    print(f"Batch mode: {len(items)} classes in {len(batches)} requests "
+          f"plus {retried} individual retries")
+    return [results[index] for index in sorted(results)], project_name
+
+
+def run_project(project_dir: str, model: str = "gpt-3.5-turbo", async_mode: bool = False,
+                concurrency: Optional[int] = None, use_cache: bool = True,
+                journal: Optional[ResultJournal] = None, batch_mode: bool = False) -> Tuple[List[List[str]], str]:
+    if batch_mode:
+        workers = (concurrency or SUPPORTED_MODELS[model].max_concurrency) if async_mode else 1
+        return process_project_batched(project_dir, model, use_cache, journal, workers)
+    if async_mode:
+        return asyncio.run(process_project_async(project_dir, model, concurrency, use_cache, journal))
+    return process_project(project_dir, model, use_cache, journal)
+
+
 def test_model_call(model_name: str = "gpt-3.5-turbo") -> bool:
     print(f"\n{'=' * 50}")
     print(f"🧪 Testing model: {model_name}")
@@ -266,7 +786,7 @@ public class TestClass {
     print(f"   Configuration: {SUPPORTED_MODELS[model_name]}")
 
     try:
-        response = call_api(test_prompt, model_name, max_retries=2)
+        response = call_api(test_prompt, model_name, max_retries=2, use_cache=False)
 
         if response is None:
             print(f"❌ Test failed: API call returned None")
@@ -291,7 +811,7 @@ public class TestClass {
             print(f"   Expected: {test_class_name}")
             print(f"   Actual: {response['class_name']}")
 
-        if response["tool"] not in ["LLM", "Evosuite"]:
+        if response["tool"] not in TOOLS:
             print(f"⚠️  Warning: tool value not in expected range")
             print(f"   Expected: 'LLM' or 'Evosuite'")
             print(f"   Actual: {response['tool']}")
@@ -361,7 +881,10 @@ def run_model_tests(models_to_test: List[str] = None) -> Dict[str, bool]:
     return results
 
 
-def main(project_dirs: List[str], output_excel: str, model: str = "gpt-3.5-turbo", test_mode: bool = False):
+def main(project_dirs: List[str], output_excel: str, model: str = "gpt-3.5-turbo", test_mode: bool = False,
+         async_mode: bool = False, concurrency: Optional[int] = None, use_cache: bool = True,
+         resume: bool = False, journal_path: str = DEFAULT_JOURNAL_PATH, batch_mode: bool = False,
+         incremental: bool = False):
     if test_mode:
         print("🧪 Running in test mode...")
         success = test_model_call(model)
@@ -376,6 +899,14 @@ def main(project_dirs: List[str], output_excel: str, model: str = "gpt-3.5-turbo
         print_available_models()
         return
 
+    if COMPACTION_LEVEL not in COMPACTION_LEVELS:
+        print(f"Error: Unknown compaction level '{COMPACTION_LEVEL}', expected one of {COMPACTION_LEVELS}")
+        return
+
+    if PROMPT_LAYOUT not in PROMPT_LAYOUTS:
+        print(f"Error: Unknown prompt layout '{PROMPT_LAYOUT}', expected one of {PROMPT_LAYOUTS}")
+        return
+
     print(f"🔍 First testing if model {model} is available...")
     if not test_model_call(model):
         print(f"❌ Model test failed, program terminated")
@@ -384,24 +915,68 @@ def main(project_dirs: List[str], output_excel: str, model: str = "gpt-3.5-turbo
     print(f"\n✅ Model test passed, starting project processing...")
     print(f"Using model: {model}")
     print(f"Output file: {output_excel}")
-
-    with pd.ExcelWriter(output_excel, engine='openpyxl') as writer:
+    print(f"Journal file: {journal_path}")
+    print(f"Source compaction: {COMPACTION_LEVEL}")
+    print(f"Prompt layout: {PROMPT_LAYOUT}")
+    if METRICS_PATH:
+        print(f"Metric-augmented prompt: metrics from {METRICS_PATH}")
+    if batch_mode:
+        print(f"Batch mode: up to {SUPPORTED_MODELS[model].batch_token_budget} tokens per request")
+
+    journal = ResultJournal(journal_path)
+    if DEDUP_MODE:
+        # Seed before a reset so verdicts from earlier sweeps can be reused
+        seed_near_duplicate_index(journal, model)
+    if incremental:
+        # Unchanged files keep their journal results; changed and removed ones are invalidated
+        print(f"Incremental mode: only new or changed files since the last run (manifest: {MANIFEST_PATH})")
+        manifest = Manifest(MANIFEST_PATH)
+        ingested = []
         for project_dir in project_dirs:
-            print(f"\n{'=' * 60}")
-            print(f"Starting project: {project_dir}")
-            print(f"{'=' * 60}")
+            result = manifest.ingest(project_dir, INCLUDE_GLOBS, EXCLUDE_GLOBS)
+            result.print_report()
+            journal.invalidate(get_project_name(project_dir), result.changed + result.removed)
+            ingested.append(result)
+        manifest.save()
+        write_change_list(CHANGED_FILES_LIST, ingested)
+    elif resume:
+        print(f"Resume mode: classes already recorded in {journal_path} will be skipped")
+    else:
+        journal.reset()
 
-            results, project_name = process_project(project_dir, model)
+    project_names = []
+    for project_dir in project_dirs:
+        print(f"\n{'=' * 60}")
+        print(f"Starting project: {project_dir}")
+        print(f"{'=' * 60}")
 
-            if results:
-                df = pd.DataFrame(results, columns=["Class Name", "Suitable Tool"])
-                # Excel sheet names have a 31-character limit
-                sheet_name = project_name[:31]
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
-                print(f"\n✅ Results for project {project_name} saved to sheet: {sheet_name} in {output_excel}")
-                print(f"  Processed {len(results)} classes")
-            else:
-                print(f"\n❌ No results to save for project {project_name}")
+        results, project_name = run_project(project_dir, model, async_mode, concurrency, use_cache, journal,
+                                            batch_mode)
+        project_names.append(project_name)
+        print(f"\n  Processed {len(results)} classes for project {project_name} (journal: {journal_path})")
+
+    print(f"\n{'=' * 60}")
+    print(f"Exporting journal to {output_excel}")
+    print(f"{'=' * 60}")
+    journal.export_excel(output_excel, project_names, model)
+
+    if COMPACTION_LEVEL != "none":
+        COMPACTION_STATS.print_stats()
+    if use_cache:
+        get_cache().print_stats()
+    TRANSPORT.print_stats()
+    if DEDUP_MODE:
+        get_index(model, NEAR_DUP_THRESHOLD).print_stats()
+    if METRICS_PATH:
+        get_lookup(METRICS_PATH).print_stats()
+    if REPAIR_STATS.local or REPAIR_STATS.reasks:
+        REPAIR_STATS.print_stats()
+    TELEMETRY.print_summary()
+    TELEMETRY.write_csv(TELEMETRY_CSV)
+    TELEMETRY.write_prometheus(TELEMETRY_PROM)
+    limiter = get_model_limiter(model)
+    if limiter.waited:
+        print(f"Rate limiter: {limiter.waited:.1f}s spent waiting for {model} quota")
 
 
 if __name__ == "__main__":
@@ -424,10 +999,39 @@ if __name__ == "__main__":
     # 1. Test a single model: Set TEST_MODE = True
     # 2. Batch test multiple models: Set RUN_BATCH_TEST = True
     # 3. Normal operation: Set both to False
+    # 4. Concurrent requests: Set ASYNC_MODE = True (CONCURRENCY = None uses the model's max_concurrency)
+    # 5. Re-query every class instead of reusing llm_cache.sqlite: Set USE_CACHE = False
+    # 6. Continue an interrupted sweep from the journal: Set RESUME = True or pass --resume
+    # 7. Shrink class sources before prompting: Set COMPACTION_LEVEL to one of COMPACTION_LEVELS
+    # 8. Pack several small classes into one request (prompt-batch.txt): Set BATCH_MODE = True
+    # 9. Stream responses and stop reading once the verdict JSON is complete: Set STREAM_MODE = True
+    # 10. Only classify files added or changed since the last run: Set INCREMENTAL = True
+    #     (files are selected by INCLUDE_GLOBS / EXCLUDE_GLOBS; tests and generated code are excluded)
+    # 11. Reuse verdicts of near-identical classes instead of calling the LLM: Set DEDUP_MODE = True
+    # 12. Majority vote over several samples per class (one n=k request where supported):
+    #     Set SELF_CONSISTENCY_SAMPLES = k
+    # 13. Static instructions as a cacheable system message, class code last: Set PROMPT_LAYOUT = "prefix"
+    # 14. Send each class's precomputed static metrics and ask only for the verdict:
+    #     Set METRICS_PATH = os.path.join("..", "data", "symtrain.xlsx")
+    # 15. Resend the whole class prompt on malformed JSON instead of repairing it: Set JSON_REPAIR = False
     TEST_MODE = False
     RUN_BATCH_TEST = False
+    ASYNC_MODE = False
+    CONCURRENCY = None
+    USE_CACHE = True
+    RESUME = "--resume" in sys.argv
+    COMPACTION_LEVEL = "none"
+    BATCH_MODE = False
+    STREAM_MODE = False
+    INCREMENTAL = False
+    DEDUP_MODE = False
+    SELF_CONSISTENCY_SAMPLES = 1
+    PROMPT_LAYOUT = "inline"
+    METRICS_PATH = None
+    JSON_REPAIR = True
 
     if RUN_BATCH_TEST:
         run_model_tests()
     else:
-        main(project_dirs, output_excel, model, TEST_MODE)
\ No newline at end of file
+        main(project_dirs, output_excel, model, TEST_MODE, ASYNC_MODE, CONCURRENCY, USE_CACHE, RESUME,
+             batch_mode=BATCH_MODE, incremental=INCREMENTAL)
\ No newline at end of file
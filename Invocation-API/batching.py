@@ -0,0 +1,100 @@
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from compaction import estimate_tokens
+
+BATCH_ITEM_TEMPLATE = "Here is a Java class named {class_name}:\n\n{class_code}\n"
+
+# Upper bound on classes per request so the JSON array fits comfortably in max_tokens
+MAX_BATCH_SIZE = 20
+
+
+@dataclass
+class BatchItem:
+    index: int
+    file_path: str
+    class_name: str
+    class_code: str
+    tokens: int = 0
+
+    def __post_init__(self):
+        if not self.tokens:
+            self.tokens = estimate_tokens(BATCH_ITEM_TEMPLATE.format(class_name=self.class_name,
+                                                                      class_code=self.class_code))
+
+
+def pack_batches(items: List[BatchItem], token_budget: int,
+                 max_batch_size: int = MAX_BATCH_SIZE) -> List[List[BatchItem]]:
+    """First-fit-decreasing bin packing of classes into requests of at most `token_budget` tokens.
+
+    Two classes with the same simple name never share a batch, so every verdict can be
+    matched back to its file. Items larger than the budget end up alone in their batch.
+    Batches are returned ordered by their first file index.
+    """
+    bins: List[Tuple[int, List[BatchItem]]] = []
+    for item in sorted(items, key=lambda it: it.tokens, reverse=True):
+        for i, (used, members) in enumerate(bins):
+            if used + item.tokens <= token_budget and len(members) < max_batch_size \
+                    and all(m.class_name != item.class_name for m in members):
+                members.append(item)
+                bins[i] = (used + item.tokens, members)
+                break
+        else:
+            bins.append((item.tokens, [item]))
+
+    batches = [sorted(members, key=lambda it: it.index) for _, members in bins]
+    return sorted(batches, key=lambda members: members[0].index)
+
+
+def construct_batch_prompt(template: str, items: List[BatchItem]) -> str:
+    classes = "\n".join(BATCH_ITEM_TEMPLATE.format(class_name=it.class_name, class_code=it.class_code)
+                        for it in items)
+    return template.format(classes=classes, class_names=", ".join(it.class_name for it in items))
+
+
+def parse_batch_content(content: str) -> Optional[List[Dict[str, Any]]]:
+    """Extract the list of {"class_name", "tool"} objects from a batch response.
+
+    Accepts a bare JSON array, an array inside a code fence, or an object wrapping the
+    array (as JSON mode forces some providers to return).
+    """
+    content = content.strip()
+    try:
+        parsed = json.loads(content)
+    except json.JSONDecodeError:
+        match = re.search(r"\[.*\]", content, re.DOTALL)
+        if not match:
+            print(f"Batch response content cannot be parsed as JSON: {content}")
+            return None
+        try:
+            parsed = json.loads(match.group())
+        except json.JSONDecodeError as e:
+            print(f"Batch response JSON parsing failed: {e}")
+            return None
+
+    return batch_entries(parsed)
+
+
+def batch_entries(parsed: Any) -> Optional[List[Dict[str, Any]]]:
+    """The complete {"class_name", "tool"} objects of a decoded batch response"""
+    if isinstance(parsed, dict):
+        parsed = next((v for v in parsed.values() if isinstance(v, list)), [parsed])
+    if not isinstance(parsed, list):
+        return None
+    return [v for v in parsed if isinstance(v, dict) and "class_name" in v and "tool" in v]
+
+
+def match_batch_results(items: List[BatchItem],
+                        verdicts: Optional[List[Dict[str, Any]]]) -> Tuple[Dict[int, List[str]], List[BatchItem]]:
+    """Map verdicts back to items by class name; return ({index: [class_name, tool]}, missing items)"""
+    by_name = {str(v["class_name"]).strip(): v for v in verdicts or []}
+    results, missing = {}, []
+    for item in items:
+        verdict = by_name.get(item.class_name)
+        if verdict:
+            results[item.index] = [item.class_name, verdict["tool"]]
+        else:
+            missing.append(item)
+    return results, missing
@@ -0,0 +1,236 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import api
+from transport import Transport, percentile
+from telemetry import Telemetry
+from repair import RepairStats
+from mock_server import MockConfig, MockServer, start_mock_server
+from metrics_prompt import get_lookup
+
+JAVA_TEMPLATE = """
+public class {class_name} {{
+    private int value;
+
+    public int getValue() {{
+        return value;
+    }}
+}}
+"""
+
+PROMPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt")
+
+
+def create_sample_project(root: str, num_classes: int) -> str:
+    project_dir = os.path.join(root, "sample-project")
+    os.makedirs(project_dir, exist_ok=True)
+    for i in range(num_classes):
+        class_name = f"Sample{i:04d}"
+        with open(os.path.join(project_dir, f"{class_name}.java"), "w", encoding="utf-8") as f:
+            f.write(JAVA_TEMPLATE.format(class_name=class_name))
+    return project_dir
+
+
+@contextmanager
+def mock_environment(config: MockConfig, num_classes: int) -> Iterator[Tuple[str, MockServer]]:
+    """Run api.py against a local mock server inside a scratch directory with a sample project"""
+    server, url = start_mock_server(config=config)
+    original_transport = api.TRANSPORT
+    original_telemetry = api.TELEMETRY
+    original_repair_stats = api.REPAIR_STATS
+    original_cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        project_dir = create_sample_project(workdir, num_classes)
+        for name in os.listdir(PROMPT_DIR):
+            shutil.copy(os.path.join(PROMPT_DIR, name), os.path.join(workdir, name))
+        os.chdir(workdir)
+        api.TRANSPORT = Transport([url], api.HEADERS)
+        api.TELEMETRY = Telemetry()
+        api.REPAIR_STATS = RepairStats()
+
+        try:
+            yield project_dir, server
+        finally:
+            api.TRANSPORT = original_transport
+            api.TELEMETRY = original_telemetry
+            api.REPAIR_STATS = original_repair_stats
+            os.chdir(original_cwd)
+            server.shutdown()
+
+
+def run_benchmark(num_classes: int = 40, latency: float = 0.2, model: str = "gpt-3.5-turbo",
+                  concurrency: Optional[int] = None) -> Dict[str, float]:
+    """Compare sequential and async throughput of process_project against the local mock endpoint"""
+    stats = {}
+    with mock_environment(MockConfig(latency=latency), num_classes) as (project_dir, _):
+        for label, async_mode in [("sequential", False), ("async", True)]:
+            start = time.perf_counter()
+            results, _ = api.run_project(project_dir, model, async_mode, concurrency, use_cache=False)
+            elapsed = time.perf_counter() - start
+            stats[label] = num_classes / elapsed
+            print(f"\n[{label}] {len(results)}/{num_classes} classes in {elapsed:.2f}s "
+                  f"({stats[label]:.2f} classes/s)")
+        api.TRANSPORT.print_stats()
+
+    print(f"\n{'=' * 60}")
+    print(f"Mock latency: {latency:.2f}s | Classes: {num_classes} | Model: {model}")
+    for label, throughput in stats.items():
+        print(f"  {label:<12} {throughput:8.2f} classes/s")
+    print(f"  Speedup: {stats['async'] / stats['sequential']:.1f}x")
+    return stats
+
+
+def run_load_test(config: MockConfig, num_classes: int = 200, model: str = "gpt-3.5-turbo",
+                  async_mode: bool = True, concurrency: Optional[int] = None,
+                  batch_mode: bool = False) -> Dict[str, Any]:
+    """Run process_project against the mock server and report throughput and tail latency"""
+    with mock_environment(config, num_classes) as (project_dir, server):
+        start = time.perf_counter()
+        results, _ = api.run_project(project_dir, model, async_mode, concurrency, use_cache=False,
+                                     batch_mode=batch_mode)
+        elapsed = time.perf_counter() - start
+        records = list(api.TELEMETRY.records)
+        served = dict(server.counts)
+        repairs = api.REPAIR_STATS
+
+    latencies = [r.latency for r in records]
+    outcomes: Dict[str, int] = {}
+    for r in records:
+        outcomes[r.outcome] = outcomes.get(r.outcome, 0) + 1
+
+    report = {
+        "classes": num_classes,
+        "classified": len(results),
+        "elapsed": elapsed,
+        "classes_per_second": num_classes / elapsed,
+        "requests": len(records),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies, default=0.0),
+        "outcomes": outcomes,
+        "served": served,
+        "retries_avoided": repairs.retries_avoided,
+    }
+
+    mode = "batch" if batch_mode else "async" if async_mode else "sequential"
+    print(f"\n{'=' * 60}")
+    print(f"Load test: {model} | {mode} | {config.latency_distribution} latency {config.latency:.2f}s | "
+          f"429 {config.rate_limit_rate:.0%} | 5xx {config.server_error_rate:.0%} | "
+          f"malformed {config.malformed_rate:.0%}")
+    print(f"{'=' * 60}")
+    print(f"  Classified:   {report['classified']}/{num_classes} in {elapsed:.2f}s "
+          f"({report['classes_per_second']:.2f} classes/s)")
+    print(f"  Requests:     {report['requests']} ({', '.join(f'{k}={v}' for k, v in sorted(outcomes.items()))})")
+    print(f"  Latency:      p50 {report['p50']:.3f}s | p95 {report['p95']:.3f}s | "
+          f"p99 {report['p99']:.3f}s | max {report['max']:.3f}s")
+    print(f"  Server side:  {served}")
+    if repairs.local or repairs.reasks:
+        print(f"  JSON repair:  {repairs.retries_avoided} full retries avoided ({repairs.local} local, "
+              f"{repairs.reasks_fixed}/{repairs.reasks} repair requests)")
+    return report
+
+
+def run_prompt_comparison(project_dirs: List[str], metrics_path: str, model: str = "gpt-3.5-turbo",
+                          baseline_prompt: str = "prompt-all.txt", limit: Optional[int] = None,
+                          concurrency: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """Classify the same classes with the baseline prompt and with the metric-augmented prompt.
+
+    Only classes with a row in the metrics workbook are used, so both arms see the
+    same classes. The cache is bypassed so every request reaches the endpoint.
+    Reports tokens and latency per request from telemetry, agreement between the
+    arms and, when the workbook is labelled, accuracy against the label.
+    """
+    lookup = get_lookup(metrics_path)
+    classes = []
+    for project_dir in project_dirs:
+        for file_path in api.get_java_files(project_dir):
+            class_name = api.get_class_name(file_path)
+            class_code, package = api.load_class(file_path)
+            row = lookup.find(class_name, package)
+            if row is not None:
+                classes.append((class_name, class_code, package, lookup.labels[row]))
+    classes = classes[:limit]
+    print(f"Comparing prompts on {len(classes)} classes with precomputed metrics")
+
+    original = api.PROMPT_FILE, api.METRICS_PATH
+    verdicts: Dict[str, List[Optional[str]]] = {}
+    report: Dict[str, Dict[str, Any]] = {}
+    workers = concurrency or api.SUPPORTED_MODELS[model].max_concurrency
+    try:
+        for arm, metrics in [(baseline_prompt, None), ("metrics", metrics_path)]:
+            api.PROMPT_FILE, api.METRICS_PATH = baseline_prompt, metrics
+            since = len(api.TELEMETRY.records)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                rows = list(executor.map(lambda c: api.classify_code(c[0], c[1], model, False, c[2]), classes))
+            elapsed = time.perf_counter() - start
+            records = [r for r in api.TELEMETRY.records[since:] if r.outcome == "ok"]
+            verdicts[arm] = [row[1] if row else None for row in rows]
+            labelled = [(tool, label) for tool, (_, _, _, label) in zip(verdicts[arm], classes)
+                        if tool and label is not None]
+            latencies = [r.latency for r in records]
+            report[arm] = {
+                "classified": sum(tool is not None for tool in verdicts[arm]),
+                "requests": len(records),
+                "prompt_tokens": sum(r.prompt_tokens or 0 for r in records) / max(len(records), 1),
+                "completion_tokens": sum(r.completion_tokens or 0 for r in records) / max(len(records), 1),
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "elapsed": elapsed,
+                "accuracy": (sum((tool == "LLM") == bool(label) for tool, label in labelled) / len(labelled)
+                             if labelled else None),
+            }
+    finally:
+        api.PROMPT_FILE, api.METRICS_PATH = original
+
+    both = [(a, b) for a, b in zip(verdicts[baseline_prompt], verdicts["metrics"]) if a and b]
+    print(f"\n{'=' * 60}")
+    print(f"Prompt comparison: {model} | {len(classes)} classes")
+    print(f"{'=' * 60}")
+    for arm, r in report.items():
+        accuracy = f"{r['accuracy']:.3f}" if r["accuracy"] is not None else "n/a"
+        print(f"  {arm:<16} {r['classified']}/{len(classes)} classified | per request: "
+              f"{r['prompt_tokens']:.0f} in / {r['completion_tokens']:.1f} out | latency p50 {r['p50']:.2f}s "
+              f"p95 {r['p95']:.2f}s | wall {r['elapsed']:.1f}s | accuracy {accuracy}")
+    if both:
+        print(f"  Verdict agreement between prompts: {sum(a == b for a, b in both) / len(both):.1%}")
+    lookup.print_stats()
+    return report
+
+
+if __name__ == "__main__":
+    NUM_CLASSES = 40
+    LATENCY = 0.2
+    MODEL = "gpt-3.5-turbo"
+    CONCURRENCY = 8
+
+    # Set LOAD_TEST = True to run process_project against a mock with realistic latency and faults
+    LOAD_TEST = False
+    # Set PROMPT_COMPARISON = True to compare prompt-all.txt with the metric-augmented prompt on the
+    # configured endpoint (real requests, cache bypassed)
+    PROMPT_COMPARISON = False
+    PROMPT_COMPARISON_DIRS = ["E:\\unit-generate\\commons-lang\\src\\main\\java\\org\\apache\\commons\\lang3"]
+    METRICS_PATH = os.path.join("..", "data", "symtrain.xlsx")
+    LOAD_TEST_CONFIG = MockConfig(
+        latency=0.5,
+        latency_distribution="lognormal",
+        rate_limit_rate=0.03,
+        retry_after=0.5,
+        server_error_rate=0.02,
+        malformed_rate=0.02,
+        seed=42,
+    )
+
+    if PROMPT_COMPARISON:
+        run_prompt_comparison(PROMPT_COMPARISON_DIRS, METRICS_PATH, MODEL, limit=100, concurrency=CONCURRENCY)
+    elif LOAD_TEST:
+        run_load_test(LOAD_TEST_CONFIG, 200, MODEL, async_mode=True, concurrency=CONCURRENCY)
+    else:
+        run_benchmark(NUM_CLASSES, LATENCY, MODEL, CONCURRENCY)
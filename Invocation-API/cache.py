@@ -0,0 +1,112 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_CACHE_PATH = "llm_cache.sqlite"
+
+
+def make_cache_key(model: str, temperature: Optional[float], max_tokens: Optional[int], prompt: str,
+                   variant: str = "") -> str:
+    """Content address of a request: identical model settings and prompt give the same key.
+
+    `variant` separates requests that share a prompt but must not share an answer,
+    such as independent samples of the same class.
+    """
+    parts = [model, temperature, max_tokens, prompt] + ([variant] if variant else [])
+    payload = json.dumps(parts, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """On-disk SQLite cache of LLM responses with in-process request collapsing.
+
+    Concurrent `fetch` calls for the same key share a single computation: the first
+    caller runs it, the others wait for its result instead of sending a duplicate
+    request. Only non-None results are stored.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL)"
+        )
+        self._conn.commit()
+        self._db_lock = threading.Lock()
+        self._inflight_lock = threading.Lock()
+        self._inflight: Dict[str, threading.Event] = {}
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._db_lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, model: str, response: Any):
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created) VALUES (?, ?, ?, ?)",
+                (key, model, json.dumps(response, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+
+    def fetch(self, key: str, model: str, compute: Callable[[], Optional[Any]]) -> Optional[Any]:
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+
+            with self._inflight_lock:
+                event = self._inflight.get(key)
+                leader = event is None
+                if leader:
+                    event = self._inflight[key] = threading.Event()
+
+            if leader:
+                break
+
+            # Another thread is already requesting this prompt; wait and re-read the cache
+            self.collapsed += 1
+            event.wait()
+            cached = self.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            # The leader failed; retry as a new leader
+
+        self.misses += 1
+        try:
+            result = compute()
+            if result is not None:
+                self.put(key, model, result)
+            return result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            event.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "collapsed": self.collapsed}
+
+    def print_stats(self):
+        print(f"Cache ({self.path}): {self.hits} hits, {self.misses} API calls, "
+              f"{self.collapsed} duplicate requests collapsed")
+
+
+_caches: Dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(path: str = DEFAULT_CACHE_PATH) -> ResponseCache:
+    """Return the process-wide cache for `path`, opening it on first use"""
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = ResponseCache(path)
+        return _caches[path]
@@ -0,0 +1,226 @@
+import math
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import api
+from journal import ResultJournal, DEFAULT_JOURNAL_PATH
+from transport import percentile
+
+CASCADE_PROMPT = "prompt-cascade.txt"
+# Verdicts below this confidence go up to the next tier; the last tier is always accepted
+CONFIDENCE_THRESHOLD = 0.8
+
+_TOOL_VALUE_PREFIX = re.compile(r'"tool"\s*:\s*"?\s*$')
+
+
+def logprob_confidence(response_json: Dict[str, Any]) -> Optional[float]:
+    """Probability of the first token of the "tool" value, if the response carries logprobs"""
+    choices = response_json.get("choices") or [{}]
+    tokens = (choices[0].get("logprobs") or {}).get("content")
+    if not tokens:
+        return None
+    text = ""
+    for entry in tokens:
+        if _TOOL_VALUE_PREFIX.search(text) and entry["token"].strip(' "'):
+            return math.exp(entry["logprob"])
+        text += entry["token"]
+    return None
+
+
+def parse_cascade_response(response_json: Dict[str, Any], model_name: str) -> Optional[Dict[str, Any]]:
+    """Verdict with a "confidence" in [0, 1]: token logprobs when available, else the self-rating"""
+    verdict = api.parse_response(response_json, model_name)
+    if not verdict or "tool" not in verdict:
+        return None
+    confidence = logprob_confidence(response_json)
+    verdict["confidence_source"] = "logprobs" if confidence is not None else "self-rated"
+    if confidence is None:
+        try:
+            confidence = float(verdict.get("confidence"))
+        except (TypeError, ValueError):
+            confidence = 0.0  # No usable signal: let the next tier decide
+    verdict["confidence"] = min(max(confidence, 0.0), 1.0)
+    return verdict
+
+
+def default_tiers() -> List[str]:
+    """Supported models from cheapest to most expensive per token"""
+    return sorted(api.SUPPORTED_MODELS, key=lambda m: (api.SUPPORTED_MODELS[m].prompt_price +
+                                                       api.SUPPORTED_MODELS[m].completion_price))
+
+
+def request_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    config = api.SUPPORTED_MODELS[model]
+    return (prompt_tokens * config.prompt_price + completion_tokens * config.completion_price) / 1e6
+
+
+@dataclass
+class TierStats:
+    model: str
+    sent: int = 0
+    accepted: int = 0
+    escalated: int = 0
+    failed: int = 0
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+    latencies: Tuple[float, ...] = ()
+
+
+def collect_tier_usage(stats: TierStats, since: int):
+    """Token, cost and latency totals from the telemetry records added during the tier"""
+    records = [r for r in api.TELEMETRY.records[since:] if r.model == api.SUPPORTED_MODELS[stats.model].name]
+    stats.requests = len(records)
+    stats.prompt_tokens = sum(r.prompt_tokens or 0 for r in records)
+    stats.completion_tokens = sum(r.completion_tokens or 0 for r in records)
+    stats.cost = request_cost(stats.model, stats.prompt_tokens, stats.completion_tokens)
+    stats.latencies = tuple(r.latency for r in records)
+
+
+def process_project_cascade(project_dir: str, tiers: List[str], threshold: float = CONFIDENCE_THRESHOLD,
+                            use_cache: bool = True, journal: Optional[ResultJournal] = None,
+                            journal_model: str = "") -> Tuple[Dict[int, List[str]], List[TierStats], float]:
+    """Run every pending class through the tiers in order, escalating low-confidence verdicts.
+
+    Returns the accepted rows by file index, per-tier statistics and the wall-clock time.
+    """
+    java_files = api.get_java_files(project_dir)
+    project_name = api.get_project_name(project_dir)
+    pending = api.get_pending_files(java_files, project_name, journal_model, journal)
+    print(f"Found {len(java_files)} Java files, {len(pending)} to classify through {' > '.join(tiers)}")
+
+    prompts: Dict[int, str] = {}
+    for index, file_path in pending:
+        try:
+            template = api.read_prompt_template(CASCADE_PROMPT)
+            prompts[index] = template.format(class_name=api.get_class_name(file_path),
+                                             class_code=api.load_class_code(file_path))
+        except Exception as e:
+            print(f"  Error processing file {api.get_class_name(file_path)}: {e}")
+
+    files = dict(pending)
+    remaining = sorted(prompts)
+    accepted: Dict[int, List[str]] = {}
+    tier_stats = []
+    start = time.perf_counter()
+    for level, model in enumerate(tiers):
+        if not remaining:
+            break
+        last = level == len(tiers) - 1
+        stats = TierStats(model, sent=len(remaining))
+        since = len(api.TELEMETRY.records)
+        progress = api.TELEMETRY.progress(f"{project_name} [tier {level + 1}: {model}]", len(remaining), model)
+
+        def ask(index: int) -> Tuple[int, Optional[Dict[str, Any]]]:
+            verdict = api.call_api(prompts[index], model, use_cache=use_cache, parser=parse_cascade_response,
+                                   logprobs=True)
+            progress.tick(api.get_class_name(files[index]))
+            return index, verdict
+
+        escalate = []
+        with ThreadPoolExecutor(max_workers=api.SUPPORTED_MODELS[model].max_concurrency) as executor:
+            for index, verdict in executor.map(ask, remaining):
+                if verdict is None:
+                    stats.failed += 1
+                    escalate.append(index)
+                elif verdict["confidence"] >= threshold or last:
+                    stats.accepted += 1
+                    class_name = verdict.get("class_name", api.get_class_name(files[index]))
+                    accepted[index] = [class_name, verdict["tool"],
+                                       {"source": "cascade", "tier_model": model,
+                                        "confidence": round(verdict["confidence"], 3),
+                                        "confidence_source": verdict["confidence_source"]}]
+                    api.record_result(journal, project_name, journal_model, index, files[index], accepted[index])
+                else:
+                    stats.escalated += 1
+                    escalate.append(index)
+        collect_tier_usage(stats, since)
+        tier_stats.append(stats)
+        remaining = escalate
+
+    return accepted, tier_stats, time.perf_counter() - start
+
+
+def print_tier_report(tier_stats: List[TierStats], classes: int, elapsed: float, tiers: List[str]):
+    """Per-tier counts, cost and latency, plus savings against running the top tier on every class"""
+    print(f"\nCascade tiers ({classes} classes):")
+    for level, s in enumerate(tier_stats, 1):
+        p50 = percentile(list(s.latencies), 50)
+        print(f"  {level}. {s.model}: sent {s.sent}, accepted {s.accepted}, escalated {s.escalated}, "
+              f"failed {s.failed} | {s.requests} requests, {s.prompt_tokens} in / {s.completion_tokens} out, "
+              f"${s.cost:.4f}, latency p50 {p50:.2f}s")
+
+    total_cost = sum(s.cost for s in tier_stats)
+    first = tier_stats[0] if tier_stats else None
+    if not first or not first.requests:
+        return
+    # Top-tier-only baseline: the first tier's tokens per class at top-tier prices, and top-tier latency
+    top = tiers[-1]
+    per_class_in = first.prompt_tokens / first.requests
+    per_class_out = first.completion_tokens / first.requests
+    baseline_cost = request_cost(top, per_class_in, per_class_out) * classes
+    top_stats = next((s for s in tier_stats if s.model == top and s.latencies), None)
+    print(f"  Total: ${total_cost:.4f} vs about ${baseline_cost:.4f} for {top} on every class "
+          f"({1 - total_cost / baseline_cost:.0%} saved)" if baseline_cost else f"  Total: ${total_cost:.4f}")
+    if top_stats:
+        workers = api.SUPPORTED_MODELS[top].max_concurrency
+        baseline_time = sum(top_stats.latencies) / len(top_stats.latencies) * classes / workers
+        print(f"  Wall time: {elapsed:.1f}s vs about {baseline_time:.1f}s for {top} on every class")
+
+
+def main(project_dirs: List[str], output_excel: str, tiers: Optional[List[str]] = None,
+         threshold: float = CONFIDENCE_THRESHOLD, use_cache: bool = True, resume: bool = False,
+         journal_path: str = DEFAULT_JOURNAL_PATH):
+    tiers = tiers or default_tiers()
+    unsupported = [model for model in tiers if model not in api.SUPPORTED_MODELS]
+    if unsupported:
+        print(f"Error: Unsupported models {unsupported}")
+        api.print_available_models()
+        return
+
+    for model in tiers:
+        print(f"🔍 First testing if model {model} is available...")
+        if not api.test_model_call(model):
+            print(f"❌ Model test failed, program terminated")
+            return
+
+    journal_model = "cascade:" + ">".join(tiers)
+    print(f"\n✅ Model tests passed, cascade {' > '.join(tiers)} with confidence threshold {threshold}")
+    journal = ResultJournal(journal_path)
+    if not resume:
+        journal.reset()
+
+    project_names = []
+    for project_dir in project_dirs:
+        print(f"\n{'=' * 60}")
+        print(f"Starting project: {project_dir}")
+        print(f"{'=' * 60}")
+        accepted, tier_stats, elapsed = process_project_cascade(project_dir, tiers, threshold, use_cache,
+                                                                journal, journal_model)
+        project_names.append(api.get_project_name(project_dir))
+        print_tier_report(tier_stats, tier_stats[0].sent if tier_stats else 0, elapsed, tiers)
+
+    journal.export_excel(output_excel, project_names, journal_model)
+    if use_cache:
+        api.get_cache().print_stats()
+    api.TRANSPORT.print_stats()
+    api.TELEMETRY.print_summary()
+
+
+if __name__ == "__main__":
+    project_dirs = [
+        "E:\\unit-generate\\commons-csv\\src\\main\\java\\org\\apache\\commons\\csv",
+        "E:\\unit-generate\\commons-cli-evo\\src\\main\\java\\org\\apache\\commons\\cli",
+    ]
+    output_excel = "cascade-classification_results.xlsx"
+
+    # Cheapest first; None orders SUPPORTED_MODELS by prompt_price + completion_price
+    TIERS = None
+    THRESHOLD = CONFIDENCE_THRESHOLD
+    RESUME = False
+
+    main(project_dirs, output_excel, TIERS, THRESHOLD, resume=RESUME)
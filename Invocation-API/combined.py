@@ -0,0 +1,144 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+import api
+from journal import ResultJournal, DEFAULT_JOURNAL_PATH
+from labels import SCENARIO_COLUMNS, normalize_label
+
+COMBINED_PROMPT = "prompt-combined.txt"
+
+
+def parse_combined_response(response_json: Dict[str, Any], model_name: str) -> Optional[Dict[str, Any]]:
+    """Tool verdict plus the 11 scenario labels from one response.
+
+    A missing or unknown tool makes the response unusable (and retried); a missing
+    scenario label is kept as "N/A", as api-codesence.py does.
+    """
+    verdict = api.parse_response(response_json, model_name)
+    if not isinstance(verdict, dict) or verdict.get("tool") not in api.TOOLS:
+        print(f"Combined response has no valid tool verdict: {verdict}")
+        return None
+    verdict["scenarios"] = {column: normalize_label(verdict.get(column, "N/A")) for column in SCENARIO_COLUMNS}
+    return verdict
+
+
+def construct_combined_prompt(class_name: str, class_code: str) -> str:
+    template = api.read_prompt_template(COMBINED_PROMPT)
+    return template.format(class_name=class_name, class_code=class_code)
+
+
+def process_project_combined(project_dir: str, model: str = "gpt-3.5-turbo", use_cache: bool = True,
+                             journal: Optional[ResultJournal] = None,
+                             concurrency: Optional[int] = None) -> str:
+    """One request per class yields both the tool verdict and the scenario labels.
+
+    Results are journaled with the scenario labels attached, so classes that only
+    have a plain tool verdict from an earlier api.py run are queried again.
+    """
+    java_files = api.get_java_files(project_dir)
+    project_name = api.get_project_name(project_dir)
+    done = journal.project_records(project_name, model) if journal else {}
+    pending = [(index, path) for index, path in enumerate(java_files) if "scenarios" not in done.get(path, {})]
+    print(f"Found {len(java_files)} Java files, {len(pending)} need a combined verdict")
+
+    progress = api.TELEMETRY.progress(project_name, len(pending), model)
+
+    def classify(index: int, file_path: str):
+        class_name = api.get_class_name(file_path)
+        try:
+            prompt = construct_combined_prompt(class_name, api.load_class_code(file_path))
+        except Exception as e:
+            print(f"  Error processing file {class_name}: {e}")
+            return
+        response = api.call_api(prompt, model, use_cache=use_cache, parser=parse_combined_response)
+        if response:
+            print(f"  Successfully parsed {class_name} -> {response['tool']}")
+            if journal:
+                journal.append({"project": project_name, "model": model, "index": index, "file": file_path,
+                                "class_name": response.get("class_name", class_name), "tool": response["tool"],
+                                "scenarios": response["scenarios"]})
+        else:
+            print(f"  Skipping {class_name} due to empty or invalid response")
+        progress.tick(class_name)
+
+    workers = concurrency or api.SUPPORTED_MODELS[model].max_concurrency
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(classify, index, path) for index, path in pending]:
+            future.result()
+    return project_name
+
+
+def build_codersence_frame(journal: ResultJournal, project_name: str, model: str) -> pd.DataFrame:
+    records = sorted(journal.project_records(project_name, model).values(),
+                     key=lambda r: (r.get("index", 0), r["file"]))
+    rows = [[r["class_name"]] + [r["scenarios"].get(column, "N/A") for column in SCENARIO_COLUMNS]
+            for r in records if "scenarios" in r]
+    return pd.DataFrame(rows, columns=["class_name"] + SCENARIO_COLUMNS)
+
+
+def export_codersence(journal: ResultJournal, output_excel: str, projects: List[str], model: str):
+    with pd.ExcelWriter(output_excel, engine='openpyxl') as writer:
+        for project_name in projects:
+            df = build_codersence_frame(journal, project_name, model)
+            if df.empty:
+                print(f"❌ No scenario labels to save for project {project_name}")
+                continue
+            # Excel sheet names have a 31-character limit
+            sheet_name = project_name[:31]
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+            print(f"✅ Scenario labels for project {project_name} saved to sheet: {sheet_name} in {output_excel}")
+
+
+def main(project_dirs: List[str], output_excel: str, codersence_excel: str, model: str = "gpt-3.5-turbo",
+         concurrency: Optional[int] = None, use_cache: bool = True, resume: bool = False,
+         journal_path: str = DEFAULT_JOURNAL_PATH):
+    if model not in api.SUPPORTED_MODELS:
+        print(f"Error: Unsupported model '{model}'")
+        api.print_available_models()
+        return
+
+    print(f"🔍 First testing if model {model} is available...")
+    if not api.test_model_call(model):
+        print(f"❌ Model test failed, program terminated")
+        return
+
+    print(f"\n✅ Model test passed, classifying tool and scenarios in one request per class")
+    journal = ResultJournal(journal_path)
+    if not resume:
+        journal.reset()
+
+    start = time.time()
+    project_names = []
+    for project_dir in project_dirs:
+        print(f"\n{'=' * 60}")
+        print(f"Starting project: {project_dir}")
+        print(f"{'=' * 60}")
+        project_names.append(process_project_combined(project_dir, model, use_cache, journal, concurrency))
+
+    journal.export_excel(output_excel, project_names, model)
+    export_codersence(journal, codersence_excel, project_names, model)
+
+    print(f"\nCombined run finished in {time.time() - start:.1f}s")
+    if use_cache:
+        api.get_cache().print_stats()
+    api.TRANSPORT.print_stats()
+    api.TELEMETRY.print_summary()
+
+
+if __name__ == "__main__":
+    project_dirs = [
+        "E:\\unit-generate\\jfreechart154\\src\\main\\java\\org\\jfree",
+    ]
+
+    # Replaces running api.py and api-codesence.py separately: each class source is sent once
+    output_excel = "classification_results.xlsx"
+    codersence_excel = "codersence.xlsx"
+    model = "gemini-2.5-flash-lite-preview-06-17"
+    CONCURRENCY = None
+    USE_CACHE = True
+    RESUME = False
+
+    main(project_dirs, output_excel, codersence_excel, model, CONCURRENCY, USE_CACHE, RESUME)
@@ -0,0 +1,220 @@
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+# Compaction levels, each including everything removed by the previous one
+COMPACTION_LEVELS = ["none", "imports", "comments", "skeleton"]
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z_$][A-Za-z0-9_$]*|\d+(?:\.\d+)?|\S")
+IMPORT_PATTERN = re.compile(r"^\s*(package|import)\s+[\w.*\s]+;[ \t]*\n?", re.MULTILINE)
+METHOD_HEADER_PATTERN = re.compile(
+    r"(?:^|[\s;}])(?:@\w+(?:\([^)]*\))?\s+)*[\w<>\[\],.?\s]*?\b(\w+)\s*\([^;{}]*\)\s*(?:throws\s+[\w.,\s]+)?$",
+    re.DOTALL
+)
+CONTROL_KEYWORDS = {"if", "for", "while", "switch", "catch", "synchronized", "try", "do", "else", "return", "new"}
+BRANCH_PATTERN = re.compile(r"\b(?:if|for|while|case|catch)\b|&&|\|\||\?")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough BPE-style token count: identifiers, numbers and single punctuation marks"""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+@dataclass
+class CompactionResult:
+    level: str
+    code: str
+    original_tokens: int
+    tokens: int
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.tokens
+
+    @property
+    def saved_ratio(self) -> float:
+        return self.saved_tokens / self.original_tokens if self.original_tokens else 0.0
+
+
+def _scan(code: str) -> Tuple[str, str]:
+    """Return (code without comments, same code with literal contents blanked out).
+
+    The second string has the same length as the first and is used for structural
+    matching, so braces or semicolons inside string and char literals are ignored.
+    """
+    out, mask = [], []
+    i, n = 0, len(code)
+    while i < n:
+        c = code[i]
+        if code.startswith("//", i):
+            end = code.find("\n", i)
+            i = n if end == -1 else end
+        elif code.startswith("/*", i):
+            end = code.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            out.append(" ")
+            mask.append(" ")
+        elif code.startswith('"""', i):
+            end = code.find('"""', i + 3)
+            end = n if end == -1 else end + 3
+            out.append(code[i:end])
+            mask.append('"' + " " * (end - i - 2) + '"')
+            i = end
+        elif c in "\"'":
+            j = i + 1
+            while j < n and code[j] != c and code[j] != "\n":
+                j += 2 if code[j] == "\\" else 1
+            end = min(j + 1, n)
+            out.append(code[i:end])
+            mask.append(c + " " * (end - i - 2) + code[end - 1] if end - i >= 2 else code[i:end])
+            i = end
+        else:
+            out.append(c)
+            mask.append(c)
+            i += 1
+    return "".join(out), "".join(mask)
+
+
+def _drop_blank_lines(code: str) -> str:
+    return "\n".join(line.rstrip() for line in code.splitlines() if line.strip()) + "\n"
+
+
+def strip_license_and_imports(code: str) -> str:
+    """Remove leading license comments and the package and import statements.
+
+    A Javadoc directly above the type declaration is kept.
+    """
+    code = IMPORT_PATTERN.sub("", code)
+    javadoc = ""
+    pos = 0
+    while True:
+        pos = len(code) - len(code[pos:].lstrip())
+        if code.startswith("//", pos):
+            end = code.find("\n", pos)
+            pos = len(code) if end == -1 else end + 1
+        elif code.startswith("/*", pos):
+            end = code.find("*/", pos)
+            end = len(code) if end == -1 else end + 2
+            javadoc = code[pos:end] + "\n" if code.startswith("/**", pos) else ""
+            pos = end
+        else:
+            break
+    return javadoc + code[pos:]
+
+
+def strip_comments(code: str) -> str:
+    return _drop_blank_lines(_scan(code)[0])
+
+
+def find_methods(code: str) -> List[Tuple[str, int, int]]:
+    """Locate method and constructor bodies in comment-free code as (name, open, close) brace offsets"""
+    _, mask = _scan(code)
+    methods = []
+    stack = []
+    last_boundary = 0
+    for i, c in enumerate(mask):
+        if c == "{":
+            header = mask[last_boundary:i]
+            match = METHOD_HEADER_PATTERN.search(header)
+            is_method = bool(match) and match.group(1) not in CONTROL_KEYWORDS \
+                and "=" not in header and "->" not in header and " new " not in f" {header}"
+            stack.append((match.group(1) if is_method else None, i))
+            last_boundary = i + 1
+        elif c == "}":
+            if stack:
+                name, start = stack.pop()
+                if name:
+                    methods.append((name, start, i))
+            last_boundary = i + 1
+        elif c == ";":
+            last_boundary = i + 1
+    return sorted(methods, key=lambda m: m[1])
+
+
+def method_complexity(body: str) -> int:
+    return 1 + len(BRANCH_PATTERN.findall(body))
+
+
+def skeletonize(code: str, elide_fraction: float = 0.5) -> str:
+    """Elide the bodies of the lowest-complexity methods, keeping signatures and fields.
+
+    Expects comment-free code. Only outermost methods are candidates; ties are broken
+    towards longer bodies, which save the most tokens.
+    """
+    _, mask = _scan(code)
+    outer = []
+    for name, start, end in find_methods(code):
+        if not outer or start > outer[-1][2]:
+            outer.append((name, start, end))
+
+    count = int(len(outer) * elide_fraction)
+    if count == 0:
+        return code
+
+    ranked = sorted(outer, key=lambda m: (method_complexity(mask[m[1]:m[2]]), -(m[2] - m[1])))
+    elided = sorted(ranked[:count], key=lambda m: m[1])
+
+    parts, pos = [], 0
+    for _, start, end in elided:
+        parts.append(code[pos:start])
+        parts.append("{ ... }")
+        pos = end + 1
+    parts.append(code[pos:])
+    return _drop_blank_lines("".join(parts))
+
+
+def compact_java(code: str, level: str = "none", elide_fraction: float = 0.5) -> CompactionResult:
+    if level not in COMPACTION_LEVELS:
+        raise ValueError(f"Unknown compaction level '{level}', expected one of {COMPACTION_LEVELS}")
+
+    compacted = code
+    rank = COMPACTION_LEVELS.index(level)
+    if rank >= 1:
+        compacted = strip_license_and_imports(compacted)
+    if rank >= 2:
+        compacted = strip_comments(compacted)
+    if rank >= 3:
+        compacted = skeletonize(compacted, elide_fraction)
+
+    return CompactionResult(level, compacted, estimate_tokens(code), estimate_tokens(compacted))
+
+
+def compaction_report(code: str, elide_fraction: float = 0.5) -> Dict[str, CompactionResult]:
+    """Compact `code` at every level, e.g. to choose a level for a project"""
+    return {level: compact_java(code, level, elide_fraction) for level in COMPACTION_LEVELS}
+
+
+class CompactionStats:
+    """Thread-safe running total of tokens saved by compaction"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.level = "none"
+        self.classes = 0
+        self.original_tokens = 0
+        self.tokens = 0
+
+    def add(self, result: CompactionResult):
+        with self._lock:
+            self.level = result.level
+            self.classes += 1
+            self.original_tokens += result.original_tokens
+            self.tokens += result.tokens
+
+    def print_stats(self):
+        saved = self.original_tokens - self.tokens
+        ratio = saved / self.original_tokens * 100 if self.original_tokens else 0.0
+        print(f"Compaction ({self.level}): {self.classes} classes, {self.original_tokens} -> {self.tokens} "
+              f"estimated input tokens ({saved} saved, {ratio:.1f}%)")
+
+
+if __name__ == "__main__":
+    import sys
+
+    for path in sys.argv[1:]:
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        print(path)
+        for level, result in compaction_report(source).items():
+            print(f"  {level:<10} {result.tokens:>7} tokens  saved {result.saved_tokens:>7} ({result.saved_ratio:.1%})")
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from compaction import TOKEN_PATTERN, strip_comments
+
+NUM_PERM = 128
+BANDS = 16  # 16 bands of 8 rows: pairs above ~0.7 Jaccard almost always share a bucket
+SHINGLE_SIZE = 5
+DEFAULT_THRESHOLD = 0.9
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_STRING_LITERAL = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+
+
+def normalized_tokens(code: str, class_name: Optional[str] = None) -> List[str]:
+    """Tokens without comments; literals and the class's own name are replaced by placeholders.
+
+    That makes e.g. DataPackageResources_ru and DataPackageResources_de, or two
+    exception subclasses differing only in their names, produce the same tokens.
+    """
+    code = _STRING_LITERAL.sub('"S"', strip_comments(code))
+    tokens = []
+    for token in TOKEN_PATTERN.findall(code):
+        if token == class_name:
+            tokens.append("$CLASS")
+        elif token[0].isdigit():
+            tokens.append("0")
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def shingles(tokens: List[str], size: int = SHINGLE_SIZE) -> Set[bytes]:
+    if len(tokens) <= size:
+        return {" ".join(tokens).encode("utf-8")}
+    return {" ".join(tokens[i:i + size]).encode("utf-8") for i in range(len(tokens) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures from (a * h + b) mod p over 32-bit shingle hashes"""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, items: Set[bytes]) -> np.ndarray:
+        hashes = np.array([int.from_bytes(hashlib.blake2b(item, digest_size=4).digest(), "little")
+                           for item in items], dtype=np.uint64)
+        permuted = (np.outer(hashes, self.a) + self.b) % _PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+
+@dataclass
+class NearDuplicate:
+    key: str
+    similarity: float
+    tool: str
+
+
+class NearDuplicateIndex:
+    """LSH index of class signatures with the verdict already obtained for each.
+
+    Candidates share at least one band; the MinHash estimate of their Jaccard
+    similarity must then reach `threshold` for the verdict to be reused.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = NUM_PERM, bands: int = BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.tools: Dict[str, str] = {}
+        self.buckets: List[Dict[bytes, List[str]]] = [defaultdict(list) for _ in range(bands)]
+        self.lookups = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+
+    def signature(self, code: str, class_name: Optional[str] = None) -> np.ndarray:
+        return self.hasher.signature(shingles(normalized_tokens(code, class_name)))
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, key: str, signature: np.ndarray, tool: str):
+        with self._lock:
+            if key in self.signatures:
+                return
+            self.signatures[key] = signature
+            self.tools[key] = tool
+            for band, band_key in enumerate(self._band_keys(signature)):
+                self.buckets[band][band_key].append(key)
+
+    def query(self, signature: np.ndarray, exclude: Optional[str] = None) -> Optional[NearDuplicate]:
+        """Most similar indexed class at or above the threshold, if any"""
+        with self._lock:
+            self.lookups += 1
+            candidates = {key for band, band_key in enumerate(self._band_keys(signature))
+                          for key in self.buckets[band].get(band_key, ()) if key != exclude}
+            best = None
+            for key in candidates:
+                similarity = float(np.mean(self.signatures[key] == signature))
+                if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                    best = NearDuplicate(key, similarity, self.tools[key])
+            if best:
+                self.reused += 1
+            return best
+
+    def print_stats(self):
+        print(f"Near-duplicate reuse: {self.reused}/{self.lookups} classes labelled from a neighbour "
+              f"(threshold {self.threshold:g}, {len(self.signatures)} classes indexed)")
+
+
+def file_signature(index: NearDuplicateIndex, file_path: str) -> Tuple[np.ndarray, str]:
+    class_name = os.path.splitext(os.path.basename(file_path))[0]
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        return index.signature(f.read(), class_name), class_name
+
+
+_indexes: Dict[str, NearDuplicateIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(model: str, threshold: float = DEFAULT_THRESHOLD) -> NearDuplicateIndex:
+    """One index per model, since verdicts are only reused within the model that gave them"""
+    with _indexes_lock:
+        if model not in _indexes:
+            _indexes[model] = NearDuplicateIndex(threshold)
+        return _indexes[model]
@@ -0,0 +1,170 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import api
+from journal import ResultJournal, DEFAULT_JOURNAL_PATH
+
+
+def ensemble_vote(votes: Dict[str, str], weights: Optional[Dict[str, float]] = None) -> Tuple[Optional[str], float]:
+    """Weighted majority over the models that answered; returns (tool, share of weight behind it).
+
+    With no weights every model counts once. Ties go to the tool chosen by the
+    highest-weighted model among the tied ones.
+    """
+    weights = weights or {}
+    totals: Dict[str, float] = {}
+    for model, tool in votes.items():
+        if tool:
+            totals[tool] = totals.get(tool, 0.0) + weights.get(model, 1.0)
+    if not totals:
+        return None, 0.0
+
+    best = max(totals.values())
+    tied = {tool for tool, total in totals.items() if total == best}
+    if len(tied) > 1:
+        ranked = sorted(votes.items(), key=lambda item: weights.get(item[0], 1.0), reverse=True)
+        winner = next(tool for _, tool in ranked if tool in tied)
+    else:
+        winner = tied.pop()
+    return winner, best / sum(totals.values())
+
+
+def process_project_fanout(project_dir: str, models: List[str], use_cache: bool = True,
+                           journal: Optional[ResultJournal] = None) -> str:
+    """Read and render every class once, then query all models concurrently.
+
+    Each model runs on its own pool sized by its max_concurrency, so the sweep
+    takes about as long as the slowest model alone. Votes go to the journal.
+    """
+    java_files = api.get_java_files(project_dir)
+    project_name = api.get_project_name(project_dir)
+
+    pending = {model: api.get_pending_files(java_files, project_name, model, journal) for model in models}
+    needed = sorted({index for jobs in pending.values() for index, _ in jobs})
+    print(f"Found {len(java_files)} Java files, {len(needed)} need at least one of {len(models)} models")
+
+    # Render each prompt once and share it across models
+    prompts: Dict[int, str] = {}
+    for index in needed:
+        file_path = java_files[index]
+        try:
+            prompts[index] = api.construct_prompt(api.get_class_name(file_path), *api.load_class(file_path))
+        except Exception as e:
+            print(f"  Error processing file {api.get_class_name(file_path)}: {e}")
+
+    progress = {model: api.TELEMETRY.progress(f"{project_name} [{model}]", len(jobs), model)
+                for model, jobs in pending.items()}
+
+    def query(model: str, index: int, file_path: str):
+        class_name = api.get_class_name(file_path)
+        response = api.call_api(prompts[index], model, use_cache=use_cache)
+        row = None
+        if response and "tool" in response:
+            row = [response.get("class_name", class_name), response["tool"]]
+        else:
+            print(f"  [{model}] Skipping {class_name} due to empty or invalid response")
+        api.record_result(journal, project_name, model, index, file_path, row)
+        progress[model].tick(class_name)
+
+    executors = {model: ThreadPoolExecutor(max_workers=api.SUPPORTED_MODELS[model].max_concurrency)
+                 for model in models}
+    try:
+        futures = [executors[model].submit(query, model, index, file_path)
+                   for model, jobs in pending.items() for index, file_path in jobs if index in prompts]
+        wait(futures)
+        for future in futures:
+            if future.exception():
+                print(f"  Error in fan-out worker: {future.exception()}")
+    finally:
+        for executor in executors.values():
+            executor.shutdown()
+
+    return project_name
+
+
+def build_ensemble_frame(journal: ResultJournal, project_name: str, models: List[str],
+                         weights: Optional[Dict[str, float]] = None) -> pd.DataFrame:
+    records = {model: journal.project_records(project_name, model) for model in models}
+    files = {}
+    for model_records in records.values():
+        for file_path, r in model_records.items():
+            files.setdefault(file_path, r)
+
+    rows = []
+    for file_path, first in sorted(files.items(), key=lambda item: (item[1].get("index", 0), item[0])):
+        votes = {model: records[model][file_path]["tool"] if file_path in records[model] else None
+                 for model in models}
+        tool, agreement = ensemble_vote(votes, weights)
+        rows.append([first["class_name"]] + [votes[model] for model in models] + [tool, round(agreement, 3)])
+    return pd.DataFrame(rows, columns=["Class Name"] + models + ["Suitable Tool", "Agreement"])
+
+
+def main(project_dirs: List[str], output_excel: str, models: List[str],
+         weights: Optional[Dict[str, float]] = None, use_cache: bool = True,
+         resume: bool = False, journal_path: str = DEFAULT_JOURNAL_PATH):
+    unsupported = [model for model in models if model not in api.SUPPORTED_MODELS]
+    if unsupported:
+        print(f"Error: Unsupported models {unsupported}")
+        api.print_available_models()
+        return
+
+    for model in models:
+        print(f"🔍 First testing if model {model} is available...")
+        if not api.test_model_call(model):
+            print(f"❌ Model test failed, program terminated")
+            return
+
+    print(f"\n✅ Model tests passed, starting fan-out over: {', '.join(models)}")
+    journal = ResultJournal(journal_path)
+    if not resume:
+        journal.reset()
+
+    start = time.time()
+    project_names = []
+    for project_dir in project_dirs:
+        print(f"\n{'=' * 60}")
+        print(f"Starting project: {project_dir}")
+        print(f"{'=' * 60}")
+        project_names.append(process_project_fanout(project_dir, models, use_cache, journal))
+
+    with pd.ExcelWriter(output_excel, engine='openpyxl') as writer:
+        for project_name in project_names:
+            df = build_ensemble_frame(journal, project_name, models, weights)
+            if df.empty:
+                print(f"❌ No results to save for project {project_name}")
+                continue
+            # Excel sheet names have a 31-character limit
+            sheet_name = project_name[:31]
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+            agreement = (df["Agreement"] == 1.0).mean()
+            print(f"✅ Results for project {project_name} saved to sheet: {sheet_name} in {output_excel}")
+            print(f"  {len(df)} classes, all models agree on {agreement:.1%}")
+
+    print(f"\nFan-out finished in {time.time() - start:.1f}s")
+    if use_cache:
+        api.get_cache().print_stats()
+    api.TRANSPORT.print_stats()
+    api.TELEMETRY.print_summary()
+
+
+if __name__ == "__main__":
+    project_dirs = [
+        "E:\\unit-generate\\commons-csv\\src\\main\\java\\org\\apache\\commons\\csv",
+        "E:\\unit-generate\\commons-cli-evo\\src\\main\\java\\org\\apache\\commons\\cli",
+    ]
+
+    output_excel = "ensemble-classification_results.xlsx"
+
+    models = [
+        "gpt-4o-mini-2024-07-18",
+        "gemini-2.5-flash-lite-preview-06-17",
+        "gpt-3.5-turbo",
+    ]
+    # Optional vote weights, e.g. from each model's accuracy in llm-acc.py; None = simple majority
+    weights = None
+    RESUME = False
+
+    main(project_dirs, output_excel, models, weights, resume=RESUME)
@@ -0,0 +1,228 @@
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import api
+from selective import LABEL, map_sources, name_project_column
+
+ROUND_SIZE = 20  # Classes every active arm classifies before the next look
+ALPHA = 0.05  # Family-wise error rate over all arms and looks
+MIN_CLASSES = 40  # No arm is stopped before it has seen this many classes
+
+
+@dataclass
+class Arm:
+    prompt_file: str
+    model: str
+    correct: int = 0
+    answered: int = 0
+    failed: int = 0
+    calls: int = 0
+    stopped_after: Optional[int] = None  # Classes seen when the arm was eliminated
+    predictions: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        return f"{self.prompt_file} x {self.model}"
+
+    @property
+    def accuracy(self) -> float:
+        """Share of calls answered correctly; a failed call counts as a wrong answer"""
+        return self.correct / self.calls if self.calls else float("nan")
+
+
+def wilson_interval(correct: int, n: int, z: float) -> Tuple[float, float]:
+    if n == 0:
+        return 0.0, 1.0
+    p = correct / n
+    centre = (p + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def load_ground_truth(truth_excel: str) -> pd.DataFrame:
+    """Labelled classes (FQN, project, 1-suit-LLM) of a sym/testart workbook"""
+    df = name_project_column(pd.read_excel(truth_excel))
+    df[LABEL] = pd.to_numeric(df[LABEL], errors='coerce')
+    return df[df[LABEL].isin([0, 1])].reset_index(drop=True)
+
+
+def sample_classes(df: pd.DataFrame, project_dirs: Dict[str, str], size: Optional[int],
+                   seed: int = 42) -> List[Tuple[str, str, int]]:
+    """(FQN, source file, label) for a random sample of labelled classes with a source file.
+
+    The order is random too, so every prefix evaluated by the sequential test is itself a random sample.
+    """
+    df = df.sample(frac=1, random_state=seed).reset_index(drop=True)
+    sample = [(str(row["class"]), source, int(row[LABEL]))
+              for (_, row), source in zip(df.iterrows(), map_sources(df, project_dirs)) if source]
+    print(f"{len(sample)}/{len(df)} labelled classes have a source file")
+    return sample[:size]
+
+
+def check_arms(arms: List[Arm]) -> bool:
+    for arm in arms:
+        if arm.model not in api.SUPPORTED_MODELS:
+            print(f"Error: Unsupported model '{arm.model}'")
+            api.print_available_models()
+            return False
+        if '"tool"' not in api.read_prompt_template(arm.prompt_file):
+            # e.g. code-sence, which only asks for scenario labels
+            print(f"Error: {arm.prompt_file} does not ask for a tool verdict")
+            return False
+    return True
+
+
+def eliminate(arms: List[Arm], z: float, seen: int, min_classes: int = MIN_CLASSES) -> List[Arm]:
+    """Stop every active arm whose interval lies entirely below the best lower bound of another arm"""
+    active = [arm for arm in arms if arm.stopped_after is None]
+    if seen < min_classes or len(active) < 2:
+        return []
+    bounds = {arm.name: wilson_interval(arm.correct, arm.calls, z) for arm in active}
+    best_lower = max(lower for lower, _ in bounds.values())
+    losers = [arm for arm in active if bounds[arm.name][1] < best_lower]
+    for arm in losers:
+        arm.stopped_after = seen
+    return losers
+
+
+def run_experiment(arms: List[Arm], sample: List[Tuple[str, str, int]], use_cache: bool = True,
+                   round_size: int = ROUND_SIZE, alpha: float = ALPHA,
+                   min_classes: int = MIN_CLASSES) -> int:
+    """Evaluate the arms round by round on the sample, all active arms concurrently.
+
+    After each round, arms whose Wilson interval falls below another arm's are stopped.
+    The intervals use a Bonferroni correction over arms and rounds, so looking after
+    every round does not inflate the error rate. Returns the number of classes seen.
+    """
+    rounds = math.ceil(len(sample) / round_size)
+    z = NormalDist().inv_cdf(1 - alpha / (2 * len(arms) * max(rounds, 1)))
+    templates = {arm.prompt_file: api.read_prompt_template(arm.prompt_file) for arm in arms}
+    workers = sum(api.SUPPORTED_MODELS[model].max_concurrency for model in {arm.model for arm in arms})
+
+    def classify(arm: Arm, fqn: str, source: str) -> Tuple[Arm, str, Optional[str]]:
+        try:
+            class_name = api.get_class_name(source)
+            prompt = templates[arm.prompt_file].format(class_name=class_name, class_code=api.load_class_code(source))
+            response = api.call_api(prompt, arm.model, use_cache=use_cache)
+        except Exception as e:
+            # Counted as a failure of the arm; one unreadable file must not end the whole run
+            print(f"  Error processing {fqn} for {arm.name}: {e}")
+            return arm, fqn, None
+        return arm, fqn, response.get("tool") if response else None
+
+    seen = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(sample), round_size):
+            active = [arm for arm in arms if arm.stopped_after is None]
+            if len(active) < 2:
+                break
+            batch = sample[start:start + round_size]
+            labels = {fqn: label for fqn, _, label in batch}
+            jobs = [(arm, fqn, source) for fqn, source, _ in batch for arm in active]
+            for arm, fqn, tool in executor.map(lambda job: classify(*job), jobs):
+                arm.calls += 1
+                if tool not in api.TOOLS:
+                    arm.failed += 1
+                    continue
+                arm.predictions[fqn] = tool
+                arm.answered += 1
+                arm.correct += int((tool == "LLM") == bool(labels[fqn]))
+            seen += len(batch)
+
+            print(f"\nAfter {seen} classes:")
+            for arm in active:
+                lower, upper = wilson_interval(arm.correct, arm.calls, z)
+                print(f"  {arm.name}: accuracy {arm.accuracy:.3f} [{lower:.3f}, {upper:.3f}]")
+            for arm in eliminate(arms, z, seen, min_classes):
+                print(f"  Stopping {arm.name}: its interval is below the leader's")
+    return seen
+
+
+def print_report(arms: List[Arm], seen: int, sample_size: int, elapsed: float):
+    ranked = sorted(arms, key=lambda arm: (arm.stopped_after is None, arm.accuracy), reverse=True)
+    print(f"\n{'=' * 60}")
+    print(f"Experiment: {len(arms)} arms, {seen}/{sample_size} classes evaluated in {elapsed:.1f}s")
+    print(f"{'=' * 60}")
+    for arm in ranked:
+        status = f"stopped after {arm.stopped_after} classes" if arm.stopped_after else "active to the end"
+        print(f"  {arm.name}: accuracy {arm.accuracy:.3f} on {arm.calls} classes "
+              f"({arm.answered} answered, {arm.failed} failed and counted as wrong) - {status}")
+    calls = sum(arm.calls for arm in arms)
+    exhaustive = len(arms) * sample_size
+    print(f"  Verdict calls: {calls} vs {exhaustive} for an exhaustive sweep of the sample "
+          f"({1 - calls / exhaustive:.0%} saved)" if exhaustive else f"  Verdict calls: {calls}")
+
+
+def save_results(arms: List[Arm], sample: List[Tuple[str, str, int]], output_excel: str):
+    summary = pd.DataFrame([{"prompt": arm.prompt_file, "model": arm.model, "accuracy": arm.accuracy,
+                             "answered": arm.answered, "failed": arm.failed, "calls": arm.calls,
+                             "stopped_after": arm.stopped_after} for arm in arms])
+    predictions = pd.DataFrame({"class": [fqn for fqn, _, _ in sample], LABEL: [label for _, _, label in sample]})
+    for arm in arms:
+        predictions[arm.name] = [arm.predictions.get(fqn) for fqn, _, _ in sample]
+    with pd.ExcelWriter(output_excel, engine='openpyxl') as writer:
+        summary.to_excel(writer, sheet_name="arms", index=False)
+        predictions.to_excel(writer, sheet_name="predictions", index=False)
+    print(f"Experiment results saved to {output_excel}")
+
+
+def main(truth_excel: str, project_dirs: Dict[str, str], arms: List[Tuple[str, str]], output_excel: str,
+         sample_size: Optional[int] = 200, seed: int = 42, use_cache: bool = True,
+         round_size: int = ROUND_SIZE, alpha: float = ALPHA):
+    arms = [Arm(prompt_file, model) for prompt_file, model in arms]
+    if not check_arms(arms):
+        return
+    for model in sorted({arm.model for arm in arms}):
+        print(f"🔍 First testing if model {model} is available...")
+        if not api.test_model_call(model):
+            print(f"❌ Model test failed, program terminated")
+            return
+
+    sample = sample_classes(load_ground_truth(truth_excel), project_dirs, sample_size, seed)
+    print(f"\n✅ Evaluating {len(arms)} arms on up to {len(sample)} classes, "
+          f"{round_size} per round, alpha {alpha:g}")
+    start = time.perf_counter()
+    seen = run_experiment(arms, sample, use_cache, round_size, alpha)
+    print_report(arms, seen, len(sample), time.perf_counter() - start)
+    save_results(arms, sample, output_excel)
+
+    if use_cache:
+        api.get_cache().print_stats()
+    api.TELEMETRY.print_summary()
+
+
+if __name__ == "__main__":
+    # Ground truth: sym-test01/testart-test01 or the *train workbooks ("1-suit-LLM" labels)
+    truth_excel = os.path.join("..", "data", "sym-test01.xlsx")
+    # Ground-truth "project" value -> source directory
+    project_dirs = {
+        "csv": "E:\\unit-generate\\commons-csv\\src\\main\\java",
+        "lang": "E:\\unit-generate\\commons-lang\\src\\main\\java",
+        "gson": "E:\\unit-generate\\google-json\\src\\main\\java",
+        "cli": "E:\\unit-generate\\commons-cli-evo\\src\\main\\java",
+        "ruler": "E:\\unit-generate\\ruler\\src\\main",
+        "dat": "D:\\restful-demo-1\\dat\\src\\main\\java",
+        "jfree": "E:\\unit-generate\\jfreechart154\\src\\main\\java",
+    }
+    output_excel = "prompt-experiment_results.xlsx"
+
+    # (prompt file, model) arms; every prompt must ask for a "tool" verdict
+    ARMS = [
+        ("prompt.txt", "gpt-4o-mini-2024-07-18"),
+        ("prompt-all.txt", "gpt-4o-mini-2024-07-18"),
+        ("prompt-select", "gpt-4o-mini-2024-07-18"),
+        ("prompt.txt", "gemini-2.5-flash-lite-preview-06-17"),
+        ("prompt-all.txt", "gemini-2.5-flash-lite-preview-06-17"),
+        ("prompt-select", "gemini-2.5-flash-lite-preview-06-17"),
+    ]
+    SAMPLE_SIZE = 200
+    ROUND = ROUND_SIZE
+
+    main(truth_excel, project_dirs, ARMS, output_excel, SAMPLE_SIZE, round_size=ROUND)
@@ -0,0 +1,177 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from compaction import strip_comments
+from labels import SCENARIO_COLUMNS, normalize_label
+
+# Labels at or above this confidence are filled without asking the LLM
+CONFIDENCE_THRESHOLD = 0.8
+
+# (pattern, confidence) per column; a match means "yes". Patterns run on the source without comments.
+RULES: Dict[str, List[Tuple[str, float]]] = {
+    "String processing": [
+        (r"\bimport\s+java\.util\.regex\.", 0.95),
+        (r"\bimport\s+java\.text\.", 0.9),
+        (r"\bStringBuilder\b|\bStringBuffer\b", 0.85),
+        (r"\.(?:split|replaceAll|replaceFirst|matches|substring|toLowerCase|toUpperCase)\s*\(", 0.85),
+        (r"\bString\.format\s*\(", 0.8),
+    ],
+    "File operations": [
+        (r"\bimport\s+java\.nio\.file\.", 0.95),
+        (r"\bimport\s+java\.io\.(?:File|FileInputStream|FileOutputStream|FileReader|FileWriter|"
+         r"RandomAccessFile)\s*;", 0.95),
+        (r"\bnew\s+File(?:InputStream|OutputStream|Reader|Writer)?\s*\(", 0.95),
+        (r"\bFiles\.\w+\s*\(|\bPaths\.get\s*\(", 0.95),
+        # Generic streams are often in-memory; not enough on their own
+        (r"\bimport\s+java\.io\.(?:\*|\w*(?:Reader|Writer|Stream))\s*;", 0.6),
+    ],
+    "Network communication": [
+        (r"\bimport\s+java\.net\.(?:Socket|ServerSocket|HttpURLConnection|URLConnection|DatagramSocket)\s*;", 0.95),
+        (r"\bimport\s+java\.net\.http\.", 0.95),
+        (r"\bimport\s+(?:javax\.net|okhttp3|org\.apache\.http|io\.netty|javax\.ws\.rs)\.", 0.95),
+        (r"\b(?:openConnection|openStream)\s*\(", 0.9),
+        (r"\bimport\s+java\.net\.(?:URL|URI|InetAddress)\s*;", 0.6),
+    ],
+    "Database operations": [
+        (r"\bimport\s+(?:java\.sql|javax\.sql|javax\.persistence|jakarta\.persistence|org\.hibernate)\.", 0.95),
+        (r"@(?:Entity|Table|Repository|Query)\b", 0.9),
+        (r"\b(?:executeQuery|executeUpdate|prepareStatement)\s*\(", 0.95),
+        (r"\"\s*(?:SELECT|INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s", 0.85),
+    ],
+    "Mathematical calculation": [
+        (r"\bimport\s+java\.math\.", 0.9),
+        (r"\bMath\.(?:sqrt|pow|sin|cos|tan|atan2?|log|log10|exp|floor|ceil|hypot|toRadians)\s*\(", 0.9),
+        (r"\bStrictMath\.", 0.9),
+    ],
+    "User Interface (UI)": [
+        (r"\bimport\s+(?:java\.awt|javax\.swing|javafx|org\.eclipse\.swt|android\.(?:view|widget))\.", 0.95),
+        (r"\bextends\s+(?:JPanel|JFrame|JComponent|JDialog|Activity|Fragment|Application)\b", 0.95),
+    ],
+    "Business Logic": [
+        (r"@(?:Service|Controller|RestController|Transactional)\b", 0.9),
+        (r"\bclass\s+\w+(?:Service|Controller|Validator|Workflow|Policy)\b", 0.8),
+    ],
+    "Data Structures and Algorithms": [
+        (r"\b(?:implements|extends)\s+[\w<>, ]*\b(?:Collection|List|Set|Map|Queue|Deque|Iterator|Iterable|"
+         r"Abstract(?:List|Set|Map|Collection|Queue))\b", 0.9),
+        (r"\bCollections\.sort\s*\(|\bArrays\.(?:sort|binarySearch)\s*\(", 0.85),
+        (r"\b(?:TreeMap|PriorityQueue|ArrayDeque|LinkedList)\b", 0.8),
+    ],
+    "Systems and Tools": [
+        (r"\bclass\s+\w+(?:Utils?|Helper|Helpers|Tools?)\b", 0.9),
+        (r"\bimport\s+(?:java\.util\.logging|org\.slf4j|org\.apache\.logging|org\.apache\.commons\.logging)\.",
+         0.8),
+        (r"\b(?:Runtime\.getRuntime|ProcessBuilder|System\.getProperty|System\.getenv)\b", 0.85),
+    ],
+    "Concurrency and Multithreading": [
+        (r"\bimport\s+java\.util\.concurrent\.", 0.95),
+        (r"\bsynchronized\b", 0.9),
+        (r"\bvolatile\b", 0.85),
+        (r"\b(?:extends\s+Thread|implements\s+Runnable|new\s+Thread\s*\()", 0.95),
+        (r"\.(?:wait|notify|notifyAll)\s*\(\s*\)", 0.9),
+    ],
+    "Exception handling": [
+        (r"\bclass\s+\w+\s+extends\s+\w*(?:Exception|Error|Throwable)\b", 0.95),
+        (r"\bcatch\s*\([^)]*\)\s*\{[^}]*\bthrow\s+new\b", 0.8),
+    ],
+}
+# Columns tied to specific libraries: when none of their rules match, "no" is itself reliable
+LIBRARY_BOUND = {"File operations", "Network communication", "Database operations",
+                 "User Interface (UI)", "Concurrency and Multithreading"}
+NO_CONFIDENCE = {column: 0.9 if column in LIBRARY_BOUND else 0.5 for column in SCENARIO_COLUMNS}
+# Interfaces, annotations, enums and exception types have little behaviour; absent signals mean "no"
+TYPE_DECLARATION = re.compile(r"(?<![.\w])(@interface|class|interface|enum)\s+\w+[^{;]*")
+EXCEPTION_HEADER = re.compile(r"\bextends\s+[\w.]*(?:Exception|Error)\b")
+TRIVIAL_NO_CONFIDENCE = 0.85
+_LITERAL = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+
+_COMPILED = {column: [(re.compile(pattern), confidence) for pattern, confidence in rules]
+             for column, rules in RULES.items()}
+
+
+def is_trivial_type(code: str) -> bool:
+    """Whether the top-level type is an interface, annotation, enum or exception class.
+
+    Only the first declaration at brace depth 0 counts, on source with string and char
+    literals masked, so nested enums or type keywords inside strings are ignored.
+    """
+    masked = _LITERAL.sub('""', code)
+    for match in TYPE_DECLARATION.finditer(masked):
+        prefix = masked[:match.start()]
+        if prefix.count("{") == prefix.count("}"):
+            kind, header = match.group(1), match.group(0)
+            return kind != "class" or bool(EXCEPTION_HEADER.search(header))
+    return False
+
+
+def prelabel(class_code: str) -> Dict[str, Tuple[str, float]]:
+    """(label, confidence) per scenario column from imports, keywords and annotations"""
+    code = strip_comments(class_code)
+    trivial = is_trivial_type(code) and len(code.splitlines()) < 80
+    labels = {}
+    for column in SCENARIO_COLUMNS:
+        confidence = max((c for pattern, c in _COMPILED[column] if pattern.search(code)), default=0.0)
+        if confidence:
+            labels[column] = ("yes", confidence)
+        else:
+            labels[column] = ("no", max(NO_CONFIDENCE[column], TRIVIAL_NO_CONFIDENCE if trivial else 0.0))
+    return labels
+
+
+def ambiguous_columns(labels: Dict[str, Tuple[str, float]], threshold: float = CONFIDENCE_THRESHOLD) -> List[str]:
+    return [column for column in SCENARIO_COLUMNS if labels[column][1] < threshold]
+
+
+def merge_labels(heuristic: Dict[str, Tuple[str, float]], llm: Optional[Dict[str, str]],
+                 threshold: float = CONFIDENCE_THRESHOLD) -> Dict[str, str]:
+    """Confident heuristic labels win; the LLM answers the rest ("N/A" if it gave nothing)"""
+    llm = llm or {}
+    return {column: label if confidence >= threshold else normalize_label(llm.get(column, "N/A"))
+            for column, (label, confidence) in heuristic.items()}
+
+
+@dataclass
+class PrelabelStats:
+    classes: int = 0
+    calls_avoided: int = 0
+    columns_filled: int = 0
+    # Per column: [heuristic label == LLM label, compared], on confident columns of classes sent to the LLM
+    agreement: Dict[str, List[int]] = field(default_factory=lambda: {c: [0, 0] for c in SCENARIO_COLUMNS})
+
+    def record(self, heuristic: Dict[str, Tuple[str, float]], llm: Optional[Dict[str, str]],
+               threshold: float = CONFIDENCE_THRESHOLD):
+        self.classes += 1
+        confident = [c for c in SCENARIO_COLUMNS if heuristic[c][1] >= threshold]
+        self.columns_filled += len(confident)
+        if llm is None:
+            self.calls_avoided += 1
+            return
+        for column in confident:
+            answer = normalize_label(llm.get(column, "N/A"))
+            if answer != "N/A":
+                self.agreement[column][0] += answer == heuristic[column][0]
+                self.agreement[column][1] += 1
+
+    def print_report(self):
+        total_columns = self.classes * len(SCENARIO_COLUMNS)
+        print(f"Heuristic pre-labelling: {self.calls_avoided}/{self.classes} LLM calls avoided, "
+              f"{self.columns_filled}/{total_columns} labels filled without the LLM")
+        checked = [(c, agree, n) for c, (agree, n) in self.agreement.items() if n]
+        if checked:
+            print("  Agreement with the LLM on confident columns:")
+            for column, agree, n in checked:
+                print(f"    {column}: {agree}/{n} ({agree / n:.0%})")
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Print the pre-labels for the given .java files
+    for path in sys.argv[1:]:
+        with open(path, "r", encoding="utf-8") as f:
+            labels = prelabel(f.read())
+        print(path)
+        for column, (label, confidence) in labels.items():
+            marker = "" if confidence >= CONFIDENCE_THRESHOLD else "  (ambiguous)"
+            print(f"  {column}: {label} {confidence:.2f}{marker}")
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+from typing import Any, Dict, List, Sequence, Tuple
+
+DEFAULT_MANIFEST_PATH = "ingest_manifest.json"
+DEFAULT_INCLUDE = ["**/*.java"]
+# Test sources, generated code and package/module descriptors are not classes worth classifying
+DEFAULT_EXCLUDE = [
+    "**/test/**",
+    "**/tests/**",
+    "**/generated/**",
+    "**/generated-sources/**",
+    "**/*Test.java",
+    "**/*Tests.java",
+    "**/package-info.java",
+    "**/module-info.java",
+]
+SCAN_WORKERS = 8
+
+
+def matches(rel_path: str, pattern: str) -> bool:
+    """fnmatch on a '/'-separated relative path, where a leading '**/' also matches zero directories"""
+    if fnmatch(rel_path, pattern):
+        return True
+    return pattern.startswith("**/") and fnmatch(rel_path, pattern[3:])
+
+
+def matches_any(rel_path: str, patterns: Sequence[str]) -> bool:
+    return any(matches(rel_path, pattern) for pattern in patterns)
+
+
+def project_path(project_dir: str, rel_path: str) -> str:
+    return os.path.join(project_dir, *rel_path.split("/"))
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _scan_dir(root: str, rel_dir: str) -> Tuple[List[Tuple[str, int, int]], List[str]]:
+    """List one directory: (rel_path, size, mtime_ns) per file, and relative subdirectories"""
+    files, subdirs = [], []
+    with os.scandir(os.path.join(root, rel_dir) if rel_dir else root) as entries:
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(rel_path)
+            elif entry.is_file():
+                st = entry.stat()
+                files.append((rel_path, st.st_size, st.st_mtime_ns))
+    return files, subdirs
+
+
+def scan_project(project_dir: str, include: Sequence[str] = DEFAULT_INCLUDE,
+                 exclude: Sequence[str] = DEFAULT_EXCLUDE,
+                 workers: int = SCAN_WORKERS) -> Dict[str, Tuple[int, int]]:
+    """Walk the tree one directory level at a time across a thread pool.
+
+    Returns {relative path: (size, mtime_ns)} for files matching `include` and not
+    `exclude`. Excluded directories are pruned without being listed.
+    """
+    found: Dict[str, Tuple[int, int]] = {}
+    frontier = [""]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while frontier:
+            next_frontier = []
+            for files, subdirs in executor.map(lambda rel_dir: _scan_dir(project_dir, rel_dir), frontier):
+                for rel_path, size, mtime_ns in files:
+                    if matches_any(rel_path, include) and not matches_any(rel_path, exclude):
+                        found[rel_path] = (size, mtime_ns)
+                # "dir/" matches directory patterns such as "**/test/**"
+                next_frontier += [d for d in subdirs if not matches_any(d + "/", exclude)]
+            frontier = next_frontier
+    return found
+
+
+@dataclass
+class IngestResult:
+    project_dir: str
+    files: List[str]  # Absolute paths of every matching file, sorted
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    hashed: int = 0  # Files whose content had to be read
+
+    @property
+    def queued(self) -> List[str]:
+        """Files that need classification (and metric extraction) on this run"""
+        return sorted(self.added + self.changed)
+
+    def print_report(self):
+        print(f"Ingest {self.project_dir}: {len(self.files)} files, {len(self.added)} new, "
+              f"{len(self.changed)} changed, {len(self.removed)} removed "
+              f"({self.hashed} hashed, {len(self.files) - len(self.queued)} unchanged)")
+
+
+class Manifest:
+    """Per-project record of path, size, mtime and content hash from the last ingest.
+
+    Size and mtime are only a shortcut: a file whose stat changed is hashed, and it
+    is reported as changed only if its content hash differs.
+    """
+
+    def __init__(self, path: str = DEFAULT_MANIFEST_PATH):
+        self.path = path
+        self.projects: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.projects = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Warning: Ignoring unreadable manifest {path}: {e}")
+
+    def save(self):
+        # Write then rename so an interrupted save keeps the previous manifest
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.projects, f, indent=1, sort_keys=True)
+        os.replace(self.path + ".tmp", self.path)
+
+    def ingest(self, project_dir: str, include: Sequence[str] = DEFAULT_INCLUDE,
+               exclude: Sequence[str] = DEFAULT_EXCLUDE, workers: int = SCAN_WORKERS) -> IngestResult:
+        """Scan a project, diff it against the manifest and update the manifest in memory"""
+        key = os.path.abspath(project_dir)
+        previous = self.projects.get(key, {})
+        found = scan_project(project_dir, include, exclude, workers)
+
+        to_hash = [rel for rel, (size, mtime_ns) in found.items()
+                   if rel not in previous
+                   or previous[rel].get("size") != size or previous[rel].get("mtime_ns") != mtime_ns]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            hashes = dict(zip(to_hash, executor.map(
+                lambda rel: file_hash(project_path(project_dir, rel)), to_hash)))
+
+        result = IngestResult(project_dir, [project_path(project_dir, rel) for rel in sorted(found)],
+                              hashed=len(to_hash))
+        current = {}
+        for rel, (size, mtime_ns) in found.items():
+            sha256 = hashes.get(rel) or previous[rel]["sha256"]
+            current[rel] = {"size": size, "mtime_ns": mtime_ns, "sha256": sha256}
+            if rel not in previous:
+                result.added.append(project_path(project_dir, rel))
+            elif previous[rel].get("sha256") != sha256:
+                result.changed.append(project_path(project_dir, rel))
+        result.removed = sorted(project_path(project_dir, rel) for rel in previous if rel not in found)
+        self.projects[key] = current
+        return result
+
+
+def write_change_list(path: str, results: List[IngestResult]):
+    """One queued file per line, for metric extraction tools that work from a file list"""
+    with open(path, "w", encoding="utf-8") as f:
+        for result in results:
+            for file_path in result.queued:
+                f.write(file_path + "\n")
+    print(f"Changed files list saved to {path} ({sum(len(r.queued) for r in results)} files)")
+
+
+if __name__ == "__main__":
+    project_dirs = [
+        "E:\\unit-generate\\commons-csv\\src\\main\\java\\org\\apache\\commons\\csv",
+    ]
+    # Dry run: report what api.py would re-classify; the manifest is not saved
+    manifest = Manifest()
+    for project_dir in project_dirs:
+        manifest.ingest(project_dir).print_report()
@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+import pandas as pd
+
+DEFAULT_JOURNAL_PATH = "classification_journal.jsonl"
+
+
+class ResultJournal:
+    """Append-only JSONL journal of per-class results.
+
+    Every record is flushed and fsynced as soon as it arrives, so an interrupted
+    sweep loses at most the class that was in flight. A torn final line left by a
+    crash is ignored when the journal is read back.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Start a fresh journal, keeping the previous one as <path>.bak"""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.replace(self.path, self.path + ".bak")
+                print(f"Previous journal moved to {self.path}.bak")
+
+    def append(self, record: Dict[str, Any]):
+        record = dict(record, time=time.time())
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            with open(self.path, "ab+") as f:
+                # Terminate a torn line left by a crash so it cannot swallow this record
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = b"\n" + line
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def invalidate(self, project: str, files: List[str]):
+        """Mark files as needing classification again, for every model"""
+        for file_path in files:
+            self.append({"project": project, "model": None, "file": file_path, "invalidated": True})
+
+    def load(self) -> List[Dict[str, Any]]:
+        records = []
+        if not os.path.exists(self.path):
+            return records
+        with self._lock:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line_no, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        print(f"Warning: Ignoring corrupt journal line {line_no} in {self.path}")
+        return records
+
+    def completed_files(self, project: str, model: Optional[str] = None) -> Set[str]:
+        return set(self.project_records(project, model))
+
+    def project_records(self, project: str, model: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Latest record per file of a project, keyed by file path.
+
+        Files whose latest entry is an invalidation (changed or removed source) are left out.
+        """
+        latest = {}
+        for r in self.load():
+            if r.get("project") == project and (model is None or r.get("model") in (model, None)):
+                latest[r["file"]] = r
+        return {file_path: r for file_path, r in latest.items() if not r.get("invalidated")}
+
+    def project_rows(self, project: str, model: Optional[str] = None) -> List[List[str]]:
+        """Latest [class_name, tool] row per file of a project, in original file order"""
+        latest = self.project_records(project, model)
+        ordered = sorted(latest.values(), key=lambda r: (r.get("index", 0), r["file"]))
+        return [[r["class_name"], r["tool"]] for r in ordered]
+
+    def export_excel(self, output_excel: str, projects: List[str], model: Optional[str] = None):
+        """Write one sheet per project, built entirely from the journal"""
+        with pd.ExcelWriter(output_excel, engine='openpyxl') as writer:
+            for project_name in projects:
+                results = self.project_rows(project_name, model)
+                if results:
+                    df = pd.DataFrame(results, columns=["Class Name", "Suitable Tool"])
+                    # Excel sheet names have a 31-character limit
+                    sheet_name = project_name[:31]
+                    df.to_excel(writer, sheet_name=sheet_name, index=False)
+                    print(f"✅ Results for project {project_name} saved to sheet: {sheet_name} in {output_excel}")
+                    print(f"  Exported {len(results)} classes")
+                else:
+                    print(f"❌ No results to save for project {project_name}")
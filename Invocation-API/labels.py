@@ -0,0 +1,18 @@
+from typing import Any
+
+# The 11 scenario columns of the codersence workbook written by api-codesence.py
+SCENARIO_COLUMNS = ["String processing", "File operations", "Network communication",
+                    "Database operations", "Mathematical calculation", "User Interface (UI)",
+                    "Business Logic", "Data Structures and Algorithms", "Systems and Tools",
+                    "Concurrency and Multithreading", "Exception handling"]
+
+
+def normalize_label(value: Any) -> str:
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    text = str(value).strip().lower()
+    if text in ("yes", "y", "true", "1"):
+        return "yes"
+    if text in ("no", "n", "false", "0"):
+        return "no"
+    return "N/A"
@@ -0,0 +1,110 @@
+import math
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+METRICS_PROMPT = "prompt-metrics.txt"
+LABEL = "1-suit-LLM"
+# Static metrics in the order prompt-all.txt describes them. Coverage columns (CC, MC, BC, LC and
+# their -1 variants), the label and the scenario columns are results, not inputs, and are never sent.
+METRIC_COLUMNS = ["OCmax", "OCavg", "WMC", "Dcy", "Dcy*", "DPT", "DPT*", "Level", "Level*", "PDcy", "PDpt",
+                  "Cyclic", "DIT", "CBO", "MPC", "LCOM", "RFC", "Query", "CLOC", "JLOC", "jf", "Jm", "COM_RAT",
+                  "TCOM_RAT", "TODO", "LOC", "NCLOC", "CSA", "CSO", "CSOA", "OSmax", "OSavg", "OPavg", "NOAC",
+                  "NAAC", "NOOC", "NAIC", "NOIC", "NOC", "CONS", "INNER", "Inner", "NTP", "STAT", "B", "N", "n",
+                  "D", "V", "E"]
+
+_PACKAGE = re.compile(r"^\s*package\s+([\w.]+)\s*;", re.MULTILINE)
+
+
+def package_name(class_code: str) -> Optional[str]:
+    match = _PACKAGE.search(class_code)
+    return match.group(1) if match else None
+
+
+def format_value(value: float) -> str:
+    """Up to 4 significant digits; integers without a decimal point"""
+    return str(int(value)) if float(value).is_integer() else f"{value:.4g}"
+
+
+class MetricLookup:
+    """Precomputed metric rows of a metrics workbook, keyed by fully qualified and simple class name.
+
+    A class in a package is looked up by its FQN (package declaration + class name)
+    only. The simple name is used for sources without a package declaration, and
+    only when it identifies a single row, so two classes with the same name in
+    different packages never borrow each other's metrics.
+    """
+
+    def __init__(self, metrics_excel: str, columns: Optional[List[str]] = None, label_column: str = LABEL):
+        df = pd.read_excel(metrics_excel)
+        self.columns = [c for c in (columns or METRIC_COLUMNS) if c in df.columns]
+        if not self.columns:
+            raise ValueError(f"{metrics_excel} has none of the metric columns {columns or METRIC_COLUMNS}")
+        for col in self.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        labels = pd.to_numeric(df[label_column], errors='coerce') if label_column in df.columns else None
+
+        self.metrics: List[Dict[str, float]] = []
+        self.labels: List[Optional[int]] = []
+        self.by_fqn: Dict[str, int] = {}
+        self.by_name: Dict[str, List[int]] = defaultdict(list)
+        for position, row in df.iterrows():
+            self.metrics.append({c: row[c] for c in self.columns if not pd.isna(row[c])})
+            self.labels.append(int(labels[position]) if labels is not None and labels[position] in (0, 1) else None)
+            fqn = str(row["class"]) if "class" in df.columns and not pd.isna(row["class"]) else None
+            name = str(row["sym"]) if "sym" in df.columns and not pd.isna(row["sym"]) else None
+            if fqn:
+                self.by_fqn[fqn] = len(self.metrics) - 1
+            name = name or (fqn.rsplit(".", 1)[-1] if fqn else None)
+            if name:
+                self.by_name[name].append(len(self.metrics) - 1)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        print(f"Loaded metrics of {len(df)} classes ({len(self.columns)} metrics) from {metrics_excel}")
+
+    def find(self, class_name: str, package: Optional[str] = None) -> Optional[int]:
+        """Row of the class, or None when it has none or its simple name is ambiguous.
+
+        `package` must be read from the original source, since compaction drops the declaration.
+        """
+        if package:
+            return self.by_fqn.get(f"{package}.{class_name}")
+        if len(self.by_name.get(class_name, ())) == 1:
+            return self.by_name[class_name][0]
+        return None
+
+    def get(self, class_name: str, package: Optional[str] = None) -> Optional[Dict[str, float]]:
+        row = self.find(class_name, package)
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return self.metrics[row] if row is not None else None
+
+    def table(self, class_name: str, package: Optional[str] = None) -> Optional[str]:
+        """The class's metrics as one compact "name=value" block, or None without a row"""
+        metrics = self.get(class_name, package)
+        if not metrics:
+            return None
+        values = ", ".join(f"{c}={format_value(v)}" for c, v in metrics.items() if not math.isinf(v))
+        return f"Static metrics of {class_name}: {values}"
+
+    def print_stats(self):
+        print(f"Metric lookup: {self.hits} classes with precomputed metrics, "
+              f"{self.misses} without (sent with the plain prompt)")
+
+
+_lookups: Dict[str, MetricLookup] = {}
+_lookups_lock = threading.Lock()
+
+
+def get_lookup(metrics_excel: str) -> MetricLookup:
+    with _lookups_lock:
+        if metrics_excel not in _lookups:
+            _lookups[metrics_excel] = MetricLookup(metrics_excel)
+        return _lookups[metrics_excel]
@@ -0,0 +1,313 @@
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from compaction import estimate_tokens
+
+LATENCY_DISTRIBUTIONS = ["fixed", "uniform", "exponential", "lognormal"]
+RESPONSE_STYLES = ["auto", "openai", "gemini"]
+# How a malformed response is broken: cut off after a preamble, wrapped in a fence with a trailing
+# comma, single-quoted, or the verdict written as prose
+MALFORMED_STYLES = ["truncated", "fenced", "single_quotes", "prose"]
+
+
+@dataclass
+class MockConfig:
+    """Behaviour of the mock chat completions server"""
+    latency: float = 0.2  # Mean latency in seconds
+    latency_distribution: str = "fixed"
+    latency_sigma: float = 0.5  # Spread for "uniform" (+/- fraction of mean) and "lognormal" (sigma)
+    rate_limit_rate: float = 0.0  # Fraction of requests answered with 429
+    retry_after: Optional[float] = 1.0  # Retry-After seconds sent with 429, None to omit
+    server_error_rate: float = 0.0  # Fraction of requests answered with 500/502/503
+    malformed_rate: float = 0.0  # Fraction of 200 responses whose content is not valid JSON
+    malformed_styles: Tuple[str, ...] = ("truncated",)  # Picked at random per malformed response
+    response_style: str = "auto"  # "auto" answers gemini-* models in Gemini "candidates" shape
+    chatty_words: int = 0  # Reasoning words a verbose model appends after the verdict JSON
+    prefix_cache_min_tokens: int = 1024  # Shortest system prefix the mock reports as cached
+    sample_noise: float = 0.0  # Chance that a sampled verdict flips its tool (self-consistency tests)
+    stream_chunk_chars: int = 8  # Characters of content per streamed chunk
+    stream_chunk_delay: float = 0.005  # Seconds between streamed chunks (generation speed)
+    seed: Optional[int] = None
+
+    def sample_latency(self, rng: random.Random) -> float:
+        if self.latency_distribution == "uniform":
+            return rng.uniform(self.latency * (1 - self.latency_sigma), self.latency * (1 + self.latency_sigma))
+        if self.latency_distribution == "exponential":
+            return rng.expovariate(1 / self.latency) if self.latency > 0 else 0.0
+        if self.latency_distribution == "lognormal":
+            # Parameterised so the distribution mean equals `latency`
+            mu = -self.latency_sigma ** 2 / 2
+            return self.latency * rng.lognormvariate(mu, self.latency_sigma)
+        return self.latency
+
+
+class MockChatHandler(BaseHTTPRequestHandler):
+    """Stand-in for an OpenAI-compatible /v1/chat/completions endpoint"""
+
+    def do_POST(self):
+        server = self.server
+        config: MockConfig = server.config
+        length = int(self.headers.get("Content-Length", 0))
+        params = json.loads(self.rfile.read(length) or b"{}")
+        model = params.get("model") or "mock"
+        prompt = "\n".join(str(m.get("content", "")) for m in params.get("messages", []))
+
+        with server.lock:
+            latency = config.sample_latency(server.rng)
+            roll = server.rng.random()
+            malformed = server.rng.random() < config.malformed_rate
+            malformed_style = server.rng.choice(config.malformed_styles)
+
+        time.sleep(max(0.0, latency))
+
+        if roll < config.rate_limit_rate:
+            server.count("rate_limited")
+            headers = {"Retry-After": f"{config.retry_after:g}"} if config.retry_after is not None else {}
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}, headers)
+            return
+        if roll < config.rate_limit_rate + config.server_error_rate:
+            server.count("server_error")
+            self._send_json(server.rng.choice([500, 502, 503]), {"error": {"message": "Upstream error"}})
+            return
+
+        # JSON repair requests quote the expected format, which names the class first
+        class_names = (re.findall(r"class named (\w+)", prompt) or re.findall(r'"class_name": "(\w+)"', prompt)[:1]
+                       or ["Unknown"])
+        verdicts = [{"class_name": name, "tool": "LLM" if len(name) % 2 else "Evosuite"} for name in class_names]
+        # Combined prompts also ask for yes/no scenario labels (prompt-combined.txt)
+        scenarios = re.findall(r'^"([^"]+)": "yes" or "no"', prompt, re.MULTILINE)
+        for verdict in verdicts:
+            for i, scenario in enumerate(scenarios):
+                verdict[scenario] = "yes" if (len(verdict["class_name"]) + i) % 3 == 0 else "no"
+        # Cascade prompts ask for a self-rated confidence; make it vary by class
+        if '"confidence"' in prompt:
+            for verdict in verdicts:
+                verdict["confidence"] = round(0.5 + zlib.crc32(verdict["class_name"].encode()) % 50 / 100, 2)
+        unsampled = [dict(verdict) for verdict in verdicts]
+        if config.sample_noise:
+            with server.lock:
+                for verdict in verdicts:
+                    if server.rng.random() < config.sample_noise:
+                        verdict["tool"] = "Evosuite" if verdict["tool"] == "LLM" else "LLM"
+        # Batch prompts name several classes and expect a JSON array back
+        content = json.dumps(verdicts if len(verdicts) > 1 else verdicts[0])
+        if malformed:
+            server.count("malformed")
+            content = self._malform(content, malformed_style, verdicts)
+        else:
+            server.count("ok")
+        if config.chatty_words:
+            content += "\n\nReasoning: " + " ".join(["because"] * config.chatty_words)
+
+        style = config.response_style
+        if style == "auto":
+            style = "gemini" if model.startswith("gemini") else "openai"
+        prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(content)
+        cached_tokens = server.prefix_cached_tokens(params.get("messages", []))
+        if params.get("stream"):
+            usage = None
+            if (params.get("stream_options") or {}).get("include_usage"):
+                usage = self._build_body("openai", model, content, prompt_tokens, completion_tokens,
+                                         cached_tokens)["usage"]
+            self._send_stream(style, model, content, config, usage)
+            return
+        body = self._build_body(style, model, content, prompt_tokens, completion_tokens, cached_tokens)
+        if params.get("logprobs") and style == "openai":
+            tool_probability = verdicts[0].get("confidence", 0.95)
+            body["choices"][0]["logprobs"] = {"content": self._token_logprobs(content, tool_probability)}
+        n = int(params.get("n") or 1)
+        if n > 1 and style == "openai":
+            # Extra samples of the same prompt: prompt tokens are billed once, completions n times
+            choices = [body["choices"][0]]
+            for index in range(1, n):
+                sample = [dict(verdict) for verdict in unsampled]
+                with server.lock:
+                    for verdict in sample:
+                        if server.rng.random() < config.sample_noise:
+                            verdict["tool"] = "Evosuite" if verdict["tool"] == "LLM" else "LLM"
+                choices.append({"index": index, "finish_reason": "stop", "message": {
+                    "role": "assistant", "content": json.dumps(sample if len(sample) > 1 else sample[0])}})
+            body["choices"] = choices
+            body["usage"]["completion_tokens"] = completion_tokens * n
+            body["usage"]["total_tokens"] = prompt_tokens + completion_tokens * n
+        self._send_json(200, body)
+
+    @staticmethod
+    def _malform(content: str, style: str, verdicts) -> str:
+        if style == "fenced":
+            return "```json\n" + content[:-1] + "," + content[-1] + "\n```"
+        if style == "single_quotes":
+            return content.replace('"', "'")
+        if style == "prose":
+            return " ".join(f"The class {v['class_name']} should use {v['tool']}." for v in verdicts)
+        return "Sure! Here is my answer: " + content[:max(1, len(content) // 2)]
+
+    @staticmethod
+    def _token_logprobs(content: str, tool_probability: float):
+        """OpenAI-style per-token logprobs; the first token of the "tool" value gets `tool_probability`"""
+        entries, text = [], ""
+        for token in re.findall(r'\w+|\s+|[^\w\s]', content):
+            at_tool_value = bool(re.search(r'"tool"\s*:\s*"$', text)) and token.strip()
+            entries.append({"token": token, "logprob": math.log(tool_probability if at_tool_value else 0.999)})
+            text += token
+        return entries
+
+    def _send_stream(self, style: str, model: str, content: str, config: MockConfig,
+                     usage: Optional[Dict[str, Any]] = None):
+        """Server-sent events in OpenAI delta or Gemini candidates shape, ending with [DONE].
+
+        With `usage` (stream_options.include_usage), an OpenAI-style chunk without choices
+        carrying the token counts is sent just before [DONE].
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        step = max(1, config.stream_chunk_chars)
+        try:
+            for i in range(0, len(content), step):
+                piece = content[i:i + step]
+                if style == "gemini":
+                    chunk = {"candidates": [{"content": {"role": "model", "parts": [{"text": piece}]}, "index": 0}]}
+                else:
+                    chunk = {"object": "chat.completion.chunk", "model": model,
+                             "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(config.stream_chunk_delay)
+            if usage:
+                chunk = {"object": "chat.completion.chunk", "model": model, "choices": [], "usage": usage}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.server.count("stream_completed")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the connection once it had what it needed
+            self.server.count("stream_aborted")
+
+    @staticmethod
+    def _build_body(style: str, model: str, content: str, prompt_tokens: int, completion_tokens: int,
+                    cached_tokens: int = 0) -> Dict:
+        if style == "gemini":
+            return {
+                "candidates": [{
+                    "content": {"role": "model", "parts": [{"text": content}]},
+                    "finishReason": "STOP",
+                    "index": 0
+                }],
+                "usageMetadata": {
+                    "promptTokenCount": prompt_tokens,
+                    "candidatesTokenCount": completion_tokens,
+                    "totalTokenCount": prompt_tokens + completion_tokens,
+                    "cachedContentTokenCount": cached_tokens
+                },
+                "modelVersion": model
+            }
+        return {
+            "id": f"chatcmpl-mock-{time.time_ns()}",
+            "object": "chat.completion",
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens}
+            }
+        }
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: MockConfig):
+        super().__init__(address, MockChatHandler)
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self.prefixes = set()
+
+    def prefix_cached_tokens(self, messages) -> int:
+        """Like OpenAI prompt caching: a repeated system message of enough tokens is served from
+        cache, in 128-token increments. Prompts that start with per-class text never hit."""
+        if not messages or messages[0].get("role") != "system":
+            return 0
+        system = str(messages[0].get("content", ""))
+        tokens = estimate_tokens(system)
+        with self.lock:
+            seen = system in self.prefixes
+            self.prefixes.add(system)
+        if not seen or tokens < self.config.prefix_cache_min_tokens:
+            return 0
+        return tokens // 128 * 128
+
+    def count(self, outcome: str):
+        with self.lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+
+
+def start_mock_server(host: str = "127.0.0.1", port: int = 0, latency: float = 0.2,
+                      config: Optional[MockConfig] = None) -> Tuple[MockServer, str]:
+    """Start the mock server on a background thread and return it with its endpoint URL"""
+    config = config or MockConfig(latency=latency)
+    if config.latency_distribution not in LATENCY_DISTRIBUTIONS:
+        raise ValueError(f"Unknown latency distribution '{config.latency_distribution}', "
+                         f"expected one of {LATENCY_DISTRIBUTIONS}")
+    unknown = [style for style in config.malformed_styles if style not in MALFORMED_STYLES]
+    if unknown:
+        raise ValueError(f"Unknown malformed styles {unknown}, expected some of {MALFORMED_STYLES}")
+    if config.response_style not in RESPONSE_STYLES:
+        raise ValueError(f"Unknown response style '{config.response_style}', expected one of {RESPONSE_STYLES}")
+
+    server = MockServer((host, port), config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://{host}:{server.server_address[1]}/v1/chat/completions"
+    return server, url
+
+
+if __name__ == "__main__":
+    # Point API_URLS in api.py at the printed URL to run a sweep without a real provider
+    CONFIG = MockConfig(
+        latency=1.0,
+        latency_distribution="lognormal",
+        rate_limit_rate=0.02,
+        server_error_rate=0.01,
+        malformed_rate=0.02,
+    )
+
+    server, url = start_mock_server(port=8000, config=CONFIG)
+    print(f"Mock chat completions server listening on {url}")
+    print(f"Configuration: {CONFIG}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"Served: {server.counts}")
+        server.shutdown()
@@ -0,0 +1,106 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Fraction of the provider quota we allow ourselves, leaving room for clock skew and other clients
+QUOTA_HEADROOM = 0.9
+
+# Seconds of quota that may be spent in one burst
+BURST_SECONDS = 10.0
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate` units per second.
+
+    A request larger than the bucket is admitted once the bucket is full and leaves
+    it in debt, so oversized prompts are delayed rather than rejected forever.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Block until `amount` can be taken; return the time spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                needed = min(amount, self.capacity)
+                if self.level >= needed:
+                    self.level -= amount
+                    return waited
+                delay = (needed - self.level) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def adjust(self, amount: float):
+        """Take (positive) or return (negative) units after the fact, e.g. once real usage is known"""
+        with self._lock:
+            self._refill()
+            self.level = min(self.capacity, self.level - amount)
+
+
+class RateLimiter:
+    """Request and token quotas for one model, shared by every worker"""
+
+    def __init__(self, name: str, rpm: int = 0, tpm: int = 0, headroom: float = QUOTA_HEADROOM):
+        self.name = name
+        self.requests = TokenBucket(rpm * headroom / 60, rpm * headroom / 60 * BURST_SECONDS) if rpm else None
+        self.tokens = TokenBucket(tpm * headroom / 60, tpm * headroom / 60 * BURST_SECONDS) if tpm else None
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, estimated_tokens: int):
+        waited = 0.0
+        if self.requests:
+            waited += self.requests.acquire(1)
+        if self.tokens:
+            waited += self.tokens.acquire(estimated_tokens)
+        if waited:
+            with self._lock:
+                self.waited += waited
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token bucket once the response reports its real usage"""
+        if self.tokens and actual_tokens is not None:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model: str, rpm: int = 0, tpm: int = 0) -> RateLimiter:
+    with _limiters_lock:
+        if model not in _limiters:
+            _limiters[model] = RateLimiter(model, rpm, tpm)
+        return _limiters[model]
+
+
+def interleave_by_size(jobs: List[T], size: Callable[[T], int]) -> List[T]:
+    """Order jobs largest, smallest, second largest, second smallest, ...
+
+    Big prompts are spread across the run instead of arriving together and
+    exhausting the token quota in one burst.
+    """
+    ordered = sorted(jobs, key=size, reverse=True)
+    result = []
+    low, high = 0, len(ordered) - 1
+    while low <= high:
+        result.append(ordered[low])
+        if low != high:
+            result.append(ordered[high])
+        low += 1
+        high -= 1
+    return result
@@ -0,0 +1,161 @@
+import json
+import re
+import threading
+from typing import Any, List, Optional
+
+_FENCE = re.compile(r"```[\w-]*\s*\n?(.*?)(?:```|\Z)", re.DOTALL)
+_SCHEMA = re.compile(r"following (?:JSON )?format:\s*(.*\S)", re.DOTALL)
+_OPTIONS = re.compile(r'"([^"]+)" or "([^"]+)"')
+_CLOSERS = {"{": "}", "[": "]"}
+# Longest malformed output quoted back in a repair request
+MAX_REPAIR_OUTPUT_CHARS = 4000
+
+REPAIR_PROMPT = """Convert the response below into valid JSON in exactly this format, keeping the values it gives. Respond with the JSON only.
+
+{schema}
+
+Response:
+{output}"""
+DEFAULT_SCHEMA = '{"class_name": "<class name>", "tool": "LLM" or "Evosuite"}'
+
+
+def _normalize(text: str) -> str:
+    """Rewrite single-quoted strings, drop trailing commas and close a truncated value.
+
+    A truncated value is cut back to its last complete member before the open
+    containers are closed, so a half-written string is dropped rather than kept.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    quote = None
+    escaped = False
+    value_pending = False
+    safe = (0, [])  # Output length and open containers after the last complete member
+    for char in text:
+        if quote:
+            if escaped:
+                out.append("'" if char == "'" and quote == "'" else "\\" + char)
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+                out.append('"')
+                if stack and (stack[-1] == "[" or value_pending):
+                    value_pending = False
+                    safe = (len(out), list(stack))
+            elif char == '"':
+                out.append('\\"')
+            else:
+                out.append(char)
+            continue
+
+        if char in "\"'":
+            quote = char
+            out.append('"')
+        elif char in _CLOSERS:
+            stack.append(char)
+            value_pending = False
+            out.append(char)
+        elif char in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+            out.append(char)
+            value_pending = False
+            safe = (len(out), list(stack))
+            if not stack:
+                return "".join(out)
+        elif char == ":":
+            value_pending = True
+            out.append(char)
+        elif char == ",":
+            safe = (len(out), list(stack))
+            value_pending = False
+            out.append(char)
+        else:
+            out.append(char)
+
+    length, open_containers = safe
+    truncated = "".join(out[:length]).rstrip().rstrip(",")
+    return truncated + "".join(_CLOSERS[c] for c in reversed(open_containers))
+
+
+def tolerant_loads(content: str) -> Optional[Any]:
+    """Decode JSON from a model reply despite code fences, surrounding prose, trailing commas,
+    single quotes or truncation. Returns None when nothing usable is left."""
+    fenced = _FENCE.search(content)
+    if fenced:
+        content = fenced.group(1)
+    start = min((i for i in (content.find("{"), content.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        return None
+    content = content[start:]
+    try:
+        return json.JSONDecoder().raw_decode(content)[0]
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(_normalize(content))
+    except json.JSONDecodeError:
+        return None
+
+
+def response_schema(prompt) -> str:
+    """The response format a prompt (string or chat messages) asks for, with the class name filled in"""
+    texts = [prompt] if isinstance(prompt, str) else [message["content"] for message in prompt]
+    schema = next((m.group(1) for m in map(_SCHEMA.search, texts) if m), DEFAULT_SCHEMA)
+    if "<class name>" in schema:
+        # Prefix layout: the generic system message plus a user message naming the one class
+        names = set(re.findall(r"class named (\w+)", "\n".join(texts)))
+        if len(names) == 1:
+            schema = schema.replace("<class name>", names.pop(), 1)
+    return schema
+
+
+def mentions_answer(content: str, schema: str) -> bool:
+    """Whether the output contains one of the schema's allowed answers, i.e. there is a verdict to recover"""
+    options = [option for pair in _OPTIONS.findall(schema) for option in pair]
+    return not options or any(re.search(rf"\b{re.escape(option)}\b", content) for option in options)
+
+
+def construct_repair_prompt(content: str, schema: str) -> str:
+    return REPAIR_PROMPT.format(schema=schema, output=content[:MAX_REPAIR_OUTPUT_CHARS])
+
+
+class RepairStats:
+    """Malformed responses recovered locally or by a repair request instead of a full retry"""
+
+    def __init__(self):
+        self.local = 0
+        self.reasks = 0
+        self.reasks_fixed = 0
+        self.reask_tokens = 0
+        self.tokens_avoided = 0
+        self._lock = threading.Lock()
+
+    def record_local(self):
+        with self._lock:
+            self.local += 1
+
+    def record_reask(self, repair_tokens: int, prompt_tokens: int, fixed: bool):
+        with self._lock:
+            self.reasks += 1
+            self.reask_tokens += repair_tokens
+            if fixed:
+                self.reasks_fixed += 1
+                self.tokens_avoided += prompt_tokens
+
+    @property
+    def retries_avoided(self) -> int:
+        return self.local + self.reasks_fixed
+
+    def print_stats(self):
+        print(f"JSON repair: {self.retries_avoided} full-prompt retries avoided "
+              f"({self.local} decoded locally, {self.reasks_fixed}/{self.reasks} repair requests succeeded)")
+        if self.reasks:
+            print(f"  Repair requests: ~{self.reask_tokens} prompt tokens sent instead of "
+                  f"~{self.tokens_avoided} for resending the class prompts")
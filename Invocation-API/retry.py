@@ -0,0 +1,145 @@
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+
+# Failure kinds, as classified by classify_status / classify_exception
+RATE_LIMIT = "rate_limit"
+SERVER = "server"
+TIMEOUT = "timeout"
+CONNECTION = "connection"
+CLIENT = "client"
+PARSE = "parse"
+UNKNOWN = "unknown"
+
+# Failures that say something about the provider's health and feed the circuit breaker
+PROVIDER_FAILURES = {RATE_LIMIT, SERVER, TIMEOUT, CONNECTION}
+
+# Longest Retry-After honoured, so a bogus header (e.g. a day) cannot stall a run
+MAX_RETRY_AFTER = 300.0
+
+
+def classify_status(status_code: int) -> str:
+    if status_code == 429:
+        return RATE_LIMIT
+    if status_code == 408:
+        return TIMEOUT
+    if status_code >= 500:
+        return SERVER
+    return CLIENT
+
+
+def classify_exception(error: Exception) -> str:
+    if isinstance(error, json.JSONDecodeError):
+        return PARSE
+    if isinstance(error, requests.exceptions.Timeout):
+        return TIMEOUT
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return classify_status(error.response.status_code)
+    if isinstance(error, requests.exceptions.RequestException):
+        return CONNECTION
+    if isinstance(error, (KeyError, IndexError, TypeError)):
+        return PARSE
+    return UNKNOWN
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header given as delta-seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    """Jittered exponential backoff that depends on why the attempt failed"""
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+    parse_delay: float = 0.5
+    max_retry_after: float = MAX_RETRY_AFTER
+
+    def should_retry(self, kind: str) -> bool:
+        # Bad requests, auth errors and unknown models will fail again unchanged
+        return kind != CLIENT
+
+    def delay(self, attempt: int, kind: str, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after) + random.uniform(0, self.base_delay)
+        if kind == PARSE:
+            # The provider answered fine; a malformed reply needs no cool-down
+            return self.parse_delay
+        # Full jitter: uniform in [0, base * 2^attempt], rate limits start one step higher
+        exponent = attempt + 1 if kind == RATE_LIMIT else attempt
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** exponent))
+
+
+class CircuitBreaker:
+    """Per-model breaker shared by every worker thread.
+
+    After `failure_threshold` consecutive provider failures, or whenever the provider
+    sends Retry-After, the breaker opens and every caller of `wait` blocks until it
+    closes again. Throttling then pauses the whole worker pool instead of each
+    worker spending its own retries against a provider that is refusing traffic.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown: float = 30.0,
+                 max_retry_after: float = MAX_RETRY_AFTER):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_retry_after = max_retry_after
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        while True:
+            with self._lock:
+                remaining = self.open_until - time.time()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+
+    def record_failure(self, kind: str, retry_after: Optional[float] = None):
+        if kind not in PROVIDER_FAILURES:
+            return
+        with self._lock:
+            self.consecutive_failures += 1
+            pause = 0.0
+            if retry_after is not None:
+                pause = min(retry_after, self.max_retry_after)
+            if self.consecutive_failures >= self.failure_threshold:
+                pause = max(pause, self.cooldown)
+            if pause > 0 and time.time() + pause > self.open_until:
+                self.open_until = time.time() + pause
+                self.times_opened += 1
+                print(f"[WARN] Pausing all requests to {self.name} for {pause:.1f}s "
+                      f"({kind}, {self.consecutive_failures} consecutive failures)")
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker(model)
+        return _breakers[model]
@@ -0,0 +1,188 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import api
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "TestGenSelector", "TestGenSelector-model")
+FEATURES = ["COM_RAT", "Cyclic", "Dcy*", "DPT*", "LCOM", "Level", "INNER", "jf",
+            "Level*", "String processing", "PDpt", "CLOC", "JLOC", "Jm", "Business Logic"]
+LABEL = "1-suit-LLM"
+# Ask the LLM when the local P(suit LLM) falls inside this band
+UNCERTAINTY_BAND = (0.3, 0.7)
+
+
+def name_project_column(df: pd.DataFrame) -> pd.DataFrame:
+    """Name the project column "project"; the *train workbooks call it "metrics" instead"""
+    if "project" not in df.columns and "metrics" in df.columns:
+        df = df.rename(columns={"metrics": "project"})
+    return df
+
+
+def load_metrics(metrics_excel: str) -> pd.DataFrame:
+    df = name_project_column(pd.read_excel(metrics_excel))
+    for col in FEATURES:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    # Same tolerance as TestGenSelector's clean_data; XGBoost handles the remaining NaNs
+    return df.dropna(subset=FEATURES, thresh=len(FEATURES) - 2).reset_index(drop=True)
+
+
+def score_classes(df: pd.DataFrame, model_path: str) -> np.ndarray:
+    """Local P(class is better suited to LLM-generated tests)"""
+    model = joblib.load(model_path)
+    return model.predict_proba(df[FEATURES].values)[:, 1]
+
+
+def select_for_llm(proba: np.ndarray, band: Optional[Tuple[float, float]] = UNCERTAINTY_BAND,
+                   budget: Optional[int] = None) -> List[int]:
+    """Row positions to query, most uncertain first.
+
+    With a band, every class inside it is selected; a budget then caps the count.
+    With only a budget, the `budget` classes closest to 0.5 are selected.
+    """
+    order = np.argsort(np.abs(proba - 0.5), kind="stable")
+    if band is not None:
+        order = [i for i in order if band[0] <= proba[i] <= band[1]]
+    return list(order[:budget] if budget is not None else order)
+
+
+def map_sources(df: pd.DataFrame, project_dirs: Dict[str, str]) -> List[Optional[str]]:
+    """Source file of each row, by fully qualified class name within its project directory.
+
+    A row whose FQN matches no path falls back to its simple file name only when exactly
+    one file in the project has it, so a class is never paired with a namesake elsewhere.
+    """
+    by_project = {}
+    for project, project_dir in project_dirs.items():
+        by_project[project] = {os.path.normpath(path): path for path in api.get_java_files(project_dir)}
+
+    sources = []
+    for _, row in df.iterrows():
+        files = by_project.get(row.get("project"), {})
+        suffix = os.path.normpath(str(row["class"]).replace(".", os.sep) + ".java")
+        simple = os.sep + suffix.split(os.sep)[-1]
+        match = next((path for key, path in files.items() if key.endswith(os.sep + suffix)), None)
+        if match is None:
+            namesakes = [path for key, path in files.items() if key.endswith(simple)]
+            match = namesakes[0] if len(namesakes) == 1 else None
+        sources.append(match)
+    return sources
+
+
+def tradeoff_curve(proba: np.ndarray, queried: List[int], llm_labels: Dict[int, int],
+                   y_true: np.ndarray) -> pd.DataFrame:
+    """Accuracy when the first k queried classes (most uncertain first) take the LLM verdict"""
+    predicted = (proba >= 0.5).astype(int)
+    rows = [{"llm_calls": 0, "call_fraction": 0.0, "accuracy": float(np.mean(predicted == y_true))}]
+    calls = 0
+    for position in queried:
+        if position not in llm_labels:
+            continue
+        predicted[position] = llm_labels[position]
+        calls += 1
+        rows.append({"llm_calls": calls, "call_fraction": calls / len(proba),
+                     "accuracy": float(np.mean(predicted == y_true))})
+    return pd.DataFrame(rows)
+
+
+def plot_curve(curve: pd.DataFrame, llm_only_accuracy: Optional[float], path: str):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(7, 5))
+    plt.plot(curve["llm_calls"], curve["accuracy"], marker=".", label="Local model + LLM on uncertain classes")
+    if llm_only_accuracy is not None:
+        plt.axhline(llm_only_accuracy, color="grey", linestyle="--", label="LLM on queried classes only")
+    plt.xlabel("LLM calls")
+    plt.ylabel("Accuracy")
+    plt.title("Accuracy versus LLM calls")
+    plt.legend(loc="lower right")
+    plt.grid(alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(path, dpi=300)
+    plt.close()
+    print(f"Trade-off curve saved as '{path}'")
+
+
+def main(metrics_excel: str, project_dirs: Dict[str, str], output_excel: str, model: str = "gpt-3.5-turbo",
+         dataset_type: str = "sym", band: Optional[Tuple[float, float]] = UNCERTAINTY_BAND,
+         budget: Optional[int] = None, use_cache: bool = True):
+    df = load_metrics(metrics_excel)
+    proba = score_classes(df, os.path.join(MODEL_DIR, f"XGBoost-{dataset_type}.pkl"))
+    queried = select_for_llm(proba, band, budget)
+    print(f"Scored {len(df)} classes locally; {len(queried)} are uncertain enough to ask {model}")
+
+    sources = map_sources(df, project_dirs)
+    llm_labels: Dict[int, int] = {}
+    for position in queried:
+        if sources[position] is None:
+            print(f"  No source file found for {df.at[position, 'class']}, keeping the local prediction")
+            continue
+        row = api.classify_file(sources[position], model, use_cache)
+        if row:
+            llm_labels[position] = int(row[1] == "LLM")
+
+    final = (proba >= 0.5).astype(int)
+    for position, label in llm_labels.items():
+        final[position] = label
+    result = pd.DataFrame({
+        "class": df["class"],
+        "project": df.get("project"),
+        "local_p_llm": np.round(proba, 4),
+        "queried": [position in llm_labels for position in range(len(df))],
+        "llm_label": [llm_labels.get(position) for position in range(len(df))],
+        "predicted": final,
+    })
+
+    with pd.ExcelWriter(output_excel, engine='openpyxl') as writer:
+        if LABEL in df.columns:
+            # The curve needs ground truth, so it is computed over the labelled rows only
+            y_true = pd.to_numeric(df[LABEL], errors='coerce').to_numpy()
+            result[LABEL] = y_true
+            remap = {position: i for i, position in enumerate(np.flatnonzero(np.isin(y_true, [0, 1])))}
+            curve = tradeoff_curve(proba[list(remap)], [remap[p] for p in queried if p in remap],
+                                   {remap[p]: label for p, label in llm_labels.items() if p in remap},
+                                   y_true[list(remap)].astype(int))
+            curve.to_excel(writer, sheet_name="tradeoff", index=False)
+            asked = [p for p in llm_labels if p in remap]
+            llm_only = float(np.mean([llm_labels[p] == y_true[p] for p in asked])) if asked else None
+            print(f"Accuracy: local only {curve['accuracy'].iloc[0]:.4f}, "
+                  f"with {curve['llm_calls'].iloc[-1]} LLM calls {curve['accuracy'].iloc[-1]:.4f} "
+                  f"({len(llm_labels) / len(df):.1%} of classes asked)")
+            print(curve.iloc[np.unique(np.linspace(0, len(curve) - 1, 11).astype(int))].to_string(index=False))
+            try:
+                plot_curve(curve, llm_only, os.path.splitext(output_excel)[0] + "-tradeoff.png")
+            except ImportError:
+                print("matplotlib not installed, skipping the trade-off plot")
+        result.to_excel(writer, sheet_name="predictions", index=False)
+    print(f"Predictions saved to {output_excel}")
+
+    if use_cache:
+        api.get_cache().print_stats()
+    api.TELEMETRY.print_summary()
+
+
+if __name__ == "__main__":
+    metrics_excel = os.path.join("..", "data", "sym-test01.xlsx")
+    # Metric workbook "project" value -> source directory
+    project_dirs = {
+        "csv": "E:\\unit-generate\\commons-csv\\src\\main\\java",
+        "lang": "E:\\unit-generate\\commons-lang\\src\\main\\java",
+        "gson": "E:\\unit-generate\\google-json\\src\\main\\java",
+        "cli": "E:\\unit-generate\\commons-cli-evo\\src\\main\\java",
+        "ruler": "E:\\unit-generate\\ruler\\src\\main",
+        "dat": "D:\\restful-demo-1\\dat\\src\\main\\java",
+        "jfree": "E:\\unit-generate\\jfreechart154\\src\\main\\java",
+    }
+    output_excel = "selective-classification_results.xlsx"
+    model = "gemini-2.5-flash-lite-preview-06-17"
+
+    # Query every class with local P(suit LLM) in UNCERTAINTY_BAND, or set BAND = None and
+    # BUDGET = N to query the N most uncertain classes
+    BAND = UNCERTAINTY_BAND
+    BUDGET = None
+    main(metrics_excel, project_dirs, output_excel, model, "sym", BAND, BUDGET)
@@ -0,0 +1,228 @@
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import KFold
+
+from ingest import scan_project, project_path
+from labels import SCENARIO_COLUMNS, normalize_label
+
+DEFAULT_MODEL_PATH = "semantic-attributes.pkl"
+N_FEATURES = 2 ** 18
+# Report agreement on the classes whose least certain label is at least this confident
+CONFIDENCE_THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.9]
+
+_TOKEN = re.compile(r"[A-Za-z][a-z0-9]*|[A-Z]+(?![a-z])|[{}()\[\];=<>!&|+\-*/%.@]")
+
+
+def code_tokens(code: str) -> List[str]:
+    """Identifier sub-words (camelCase and snake_case split, lower-cased) and operator symbols"""
+    return [token.lower() for token in _TOKEN.findall(code)]
+
+
+class SemanticAttributeModel:
+    """Hashed token 1-2 grams with one logistic regression per scenario column.
+
+    Hashing keeps the model free of a vocabulary, so it can be trained on one set of
+    projects and applied to any other. Columns with a single class in the training
+    data are predicted as that constant.
+    """
+
+    def __init__(self, n_features: int = N_FEATURES, C: float = 4.0):
+        self.vectorizer = HashingVectorizer(tokenizer=code_tokens, token_pattern=None, lowercase=False,
+                                            ngram_range=(1, 2), n_features=n_features,
+                                            alternate_sign=False, norm=None)
+        self.tfidf = TfidfTransformer(sublinear_tf=True)
+        self.C = C
+        self.classifiers: Dict[str, object] = {}
+
+    def _features(self, codes: Sequence[str], fit: bool = False):
+        counts = self.vectorizer.transform(codes)
+        return self.tfidf.fit_transform(counts) if fit else self.tfidf.transform(counts)
+
+    def fit(self, codes: Sequence[str], labels: pd.DataFrame) -> "SemanticAttributeModel":
+        """`labels` holds "yes"/"no" per SCENARIO_COLUMNS; rows with other values are ignored per column"""
+        X = self._features(codes, fit=True)
+        for column in SCENARIO_COLUMNS:
+            values = labels[column].map(normalize_label).to_numpy()
+            known = values != "N/A"
+            y = (values[known] == "yes").astype(int)
+            if len(set(y)) < 2:
+                self.classifiers[column] = int(y[0]) if len(y) else 0
+                continue
+            classifier = LogisticRegression(C=self.C, class_weight="balanced", max_iter=1000, solver="liblinear")
+            self.classifiers[column] = classifier.fit(X[known], y)
+        return self
+
+    def predict_proba(self, codes: Sequence[str]) -> pd.DataFrame:
+        """P(label == "yes") per class and scenario column"""
+        X = self._features(codes)
+        probabilities = {}
+        for column in SCENARIO_COLUMNS:
+            classifier = self.classifiers[column]
+            if isinstance(classifier, int):
+                probabilities[column] = np.full(X.shape[0], float(classifier))
+            else:
+                probabilities[column] = classifier.predict_proba(X)[:, 1]
+        return pd.DataFrame(probabilities)
+
+    def predict(self, codes: Sequence[str]) -> Tuple[pd.DataFrame, np.ndarray]:
+        """("yes"/"no" labels, confidence of the least certain label) per class"""
+        probabilities = self.predict_proba(codes)
+        labels = probabilities.apply(lambda p: np.where(p >= 0.5, "yes", "no"))
+        confidence = np.maximum(probabilities, 1 - probabilities).min(axis=1).to_numpy()
+        return labels, confidence
+
+    def save(self, path: str = DEFAULT_MODEL_PATH):
+        # The vectorizer is stateless and rebuilt on load, so the file does not reference this module's tokenizer
+        joblib.dump({"n_features": self.vectorizer.n_features, "C": self.C, "tfidf": self.tfidf,
+                     "classifiers": self.classifiers}, path)
+        print(f"Semantic attribute model saved to {path}")
+
+    @staticmethod
+    def load(path: str = DEFAULT_MODEL_PATH) -> "SemanticAttributeModel":
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model file {path} does not exist")
+        state = joblib.load(path)
+        model = SemanticAttributeModel(state["n_features"], state["C"])
+        model.tfidf, model.classifiers = state["tfidf"], state["classifiers"]
+        print(f"Semantic attribute model loaded from {path}")
+        return model
+
+
+def read_source(file_path: str) -> str:
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def load_journal_samples(journal_path: str) -> Tuple[List[str], pd.DataFrame]:
+    """Latest scenario labels per file from a combined.py journal, with the current source"""
+    latest = {}
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("scenarios") and os.path.exists(record["file"]):
+                latest[record["file"]] = record
+    codes = [read_source(file_path) for file_path in latest]
+    labels = pd.DataFrame([r["scenarios"] for r in latest.values()], columns=SCENARIO_COLUMNS)
+    return codes, labels
+
+
+def load_codersence_samples(codersence_excel: str, project_dirs: List[str]) -> Tuple[List[str], pd.DataFrame]:
+    """Rows of codersence workbooks (every sheet) matched to sources by class name"""
+    files = {}
+    for project_dir in project_dirs:
+        for rel_path in sorted(scan_project(project_dir)):
+            class_name = os.path.splitext(rel_path.split("/")[-1])[0]
+            files.setdefault(class_name, project_path(project_dir, rel_path))
+
+    frames = pd.read_excel(codersence_excel, sheet_name=None)
+    df = pd.concat(frames.values(), ignore_index=True).drop_duplicates("class_name")
+    df = df[df["class_name"].isin(files)]
+    missing = [column for column in SCENARIO_COLUMNS if column not in df.columns]
+    for column in missing:
+        df[column] = "N/A"
+    if missing:
+        print(f"Warning: {codersence_excel} has no columns {missing}; they are treated as unknown")
+    codes = [read_source(files[name]) for name in df["class_name"]]
+    return codes, df[SCENARIO_COLUMNS].reset_index(drop=True)
+
+
+def agreement_report(codes: List[str], labels: pd.DataFrame, folds: int = 5, seed: int = 42) -> pd.DataFrame:
+    """Cross-validated agreement of the local model with the LLM labels.
+
+    Per column: accuracy and F1 on "yes". Per confidence threshold: the share of
+    classes the local model would label on its own (coverage) and how often all 11
+    labels then match the LLM exactly, which is what decides when to fall back.
+    """
+    labels = labels.apply(lambda column: column.map(normalize_label))
+    predicted = pd.DataFrame(index=labels.index, columns=SCENARIO_COLUMNS, dtype=object)
+    confidence = np.zeros(len(codes))
+    for train, test in KFold(folds, shuffle=True, random_state=seed).split(codes):
+        model = SemanticAttributeModel().fit([codes[i] for i in train], labels.iloc[train])
+        fold_labels, fold_confidence = model.predict([codes[i] for i in test])
+        predicted.iloc[test] = fold_labels.to_numpy()
+        confidence[test] = fold_confidence
+
+    rows = []
+    for column in SCENARIO_COLUMNS:
+        known = (labels[column] != "N/A").to_numpy()
+        truth, guess = labels[column][known], predicted[column][known]
+        rows.append({"metric": column, "accuracy": accuracy_score(truth, guess),
+                     "f1_yes": f1_score(truth, guess, pos_label="yes", zero_division=0), "coverage": 1.0})
+
+    exact = (predicted.to_numpy() == labels.to_numpy()).all(axis=1)
+    for threshold in CONFIDENCE_THRESHOLDS:
+        confident = confidence >= threshold
+        rows.append({"metric": f"all labels, confidence >= {threshold:g}",
+                     "accuracy": exact[confident].mean() if confident.any() else float("nan"),
+                     "f1_yes": float("nan"), "coverage": confident.mean()})
+    return pd.DataFrame(rows)
+
+
+def label_project(model: SemanticAttributeModel, project_dir: str) -> pd.DataFrame:
+    """Codersence-format frame (class_name + 11 columns) plus the confidence of each row"""
+    rel_paths = sorted(scan_project(project_dir))
+    codes = [read_source(project_path(project_dir, rel_path)) for rel_path in rel_paths]
+    start = time.perf_counter()
+    labels, confidence = model.predict(codes)
+    elapsed = time.perf_counter() - start
+    print(f"Labelled {len(codes)} classes in {elapsed:.2f}s ({len(codes) / max(elapsed, 1e-9):.0f} classes/s)")
+    labels.insert(0, "class_name", [os.path.splitext(rel.split("/")[-1])[0] for rel in rel_paths])
+    labels["confidence"] = np.round(confidence, 3)
+    return labels
+
+
+def main(project_dirs: List[str], output_excel: str, model_path: str = DEFAULT_MODEL_PATH,
+         journal_path: Optional[str] = None, codersence_excel: Optional[str] = None,
+         training_dirs: Optional[List[str]] = None, fallback_threshold: float = 0.7):
+    if journal_path or codersence_excel:
+        if journal_path:
+            codes, labels = load_journal_samples(journal_path)
+        else:
+            codes, labels = load_codersence_samples(codersence_excel, training_dirs or [])
+        print(f"Training on {len(codes)} LLM-labelled classes")
+        report = agreement_report(codes, labels)
+        print("Agreement with LLM labels (5-fold cross-validation):")
+        print(report.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+        report.to_csv(os.path.splitext(model_path)[0] + "-agreement.csv", index=False)
+        SemanticAttributeModel().fit(codes, labels).save(model_path)
+
+    model = SemanticAttributeModel.load(model_path)
+    with pd.ExcelWriter(output_excel, engine='openpyxl') as writer:
+        for project_dir in project_dirs:
+            df = label_project(model, project_dir)
+            # Excel sheet names have a 31-character limit
+            sheet_name = os.path.basename(os.path.normpath(project_dir))[:31]
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+            uncertain = int((df["confidence"] < fallback_threshold).sum())
+            print(f"✅ {sheet_name}: {len(df)} classes saved to {output_excel}, "
+                  f"{uncertain} below confidence {fallback_threshold:g} (candidates for LLM fallback)")
+
+
+if __name__ == "__main__":
+    project_dirs = [
+        "E:\\unit-generate\\jfreechart154\\src\\main\\java\\org\\jfree",
+    ]
+    output_excel = "codersence-local.xlsx"
+
+    # Train from a combined.py journal, or from a codersence workbook plus the projects it covers;
+    # set both to None to reuse a saved model
+    JOURNAL_PATH = "classification_journal.jsonl"
+    CODERSENCE_EXCEL = None
+    TRAINING_DIRS = []
+    FALLBACK_THRESHOLD = 0.7
+
+    main(project_dirs, output_excel, DEFAULT_MODEL_PATH, JOURNAL_PATH, CODERSENCE_EXCEL, TRAINING_DIRS,
+         FALLBACK_THRESHOLD)
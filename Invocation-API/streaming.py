@@ -0,0 +1,117 @@
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+class VerdictStreamParser:
+    """Incrementally scans streamed text for the first complete JSON object holding the verdict.
+
+    Text is fed chunk by chunk; each character is examined once. Braces inside JSON
+    strings are ignored. Objects that parse but lack the required keys are skipped.
+    """
+
+    def __init__(self, required_keys: Tuple[str, ...] = ("class_name", "tool")):
+        self.required_keys = required_keys
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._start = -1
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> Optional[Dict[str, Any]]:
+        self.buffer += text
+        while self._pos < len(self.buffer):
+            c = self.buffer[self._pos]
+            self._pos += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"' and self._depth > 0:
+                self._in_string = True
+            elif c == "{":
+                if self._depth == 0:
+                    self._start = self._pos - 1
+                self._depth += 1
+            elif c == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    verdict = self._try_parse(self.buffer[self._start:self._pos])
+                    if verdict is not None:
+                        return verdict
+        return None
+
+    def _try_parse(self, candidate: str) -> Optional[Dict[str, Any]]:
+        try:
+            parsed = json.loads(candidate)
+        except json.JSONDecodeError:
+            return None
+        if isinstance(parsed, dict) and all(key in parsed for key in self.required_keys):
+            return parsed
+        return None
+
+
+def extract_stream_text(chunk: Dict[str, Any]) -> str:
+    """Text delta of one streamed chunk, OpenAI ("choices[].delta") or Gemini ("candidates") style"""
+    if chunk.get("choices"):
+        delta = chunk["choices"][0].get("delta") or chunk["choices"][0].get("message") or {}
+        return delta.get("content") or ""
+    if chunk.get("candidates"):
+        parts = (chunk["candidates"][0].get("content") or {}).get("parts") or []
+        return "".join(part.get("text", "") for part in parts)
+    return ""
+
+
+def iter_sse_data(lines: Iterable[str]) -> Iterable[Dict[str, Any]]:
+    for line in lines:
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        try:
+            yield json.loads(data)
+        except json.JSONDecodeError:
+            continue
+
+
+@dataclass
+class StreamResult:
+    content: str
+    verdict: Optional[Dict[str, Any]]
+    time_to_verdict: Optional[float]
+    total_latency: float
+    terminated_early: bool
+    usage: Dict[str, Any] = field(default_factory=dict)
+
+
+def read_verdict_stream(response, start: float) -> StreamResult:
+    """Consume a server-sent-events chat completion until a verdict object is complete.
+
+    The connection is closed as soon as the verdict is read, so the provider stops
+    generating (and billing) whatever the model would have said afterwards.
+    `start` is the perf_counter value taken before the request was sent.
+    """
+    parser = VerdictStreamParser()
+    verdict, time_to_verdict, usage = None, None, {}
+    stream_ended = False
+    try:
+        for chunk in iter_sse_data(response.iter_lines(decode_unicode=True)):
+            if chunk.get("usage"):
+                usage = chunk["usage"]
+            verdict = parser.feed(extract_stream_text(chunk))
+            if verdict is not None:
+                time_to_verdict = time.perf_counter() - start
+                break
+        else:
+            stream_ended = True
+    finally:
+        response.close()
+
+    return StreamResult(parser.buffer, verdict, time_to_verdict, time.perf_counter() - start,
+                        verdict is not None and not stream_ended, usage)
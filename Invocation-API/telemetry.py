@@ -0,0 +1,185 @@
+import csv
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, List, Optional
+
+from transport import percentile
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = [0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0]
+
+
+@dataclass
+class RequestRecord:
+    timestamp: float
+    model: str
+    endpoint: str
+    attempt: int
+    latency: float
+    status_code: Optional[int]
+    prompt_tokens: Optional[int]
+    completion_tokens: Optional[int]
+    outcome: str
+    time_to_verdict: Optional[float] = None
+    cached_tokens: Optional[int] = None
+
+
+def _empty_model_summary() -> Dict[str, Any]:
+    return {"requests": 0, "latency_sum": 0.0, "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+            "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "outcomes": defaultdict(int), "latencies": [],
+            "verdict_latencies": []}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+class Telemetry:
+    """Collects one RequestRecord per API attempt plus completed-class counts"""
+
+    def __init__(self):
+        self.records: List[RequestRecord] = []
+        self.classes_completed: Dict[str, int] = defaultdict(int)
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, model: str, endpoint: Optional[str], attempt: int, latency: float, outcome: str,
+               status_code: Optional[int] = None, usage: Optional[Dict[str, Any]] = None,
+               time_to_verdict: Optional[float] = None):
+        usage = usage or {}
+        record = RequestRecord(time.time(), model, endpoint or "", attempt, latency, status_code,
+                               usage.get("prompt_tokens"), usage.get("completion_tokens"), outcome,
+                               time_to_verdict, usage.get("cached_tokens"))
+        with self._lock:
+            self.records.append(record)
+
+    def class_completed(self, model: str):
+        with self._lock:
+            self.classes_completed[model] += 1
+
+    def progress(self, label: str, total: int, model: str) -> "ProgressTracker":
+        return ProgressTracker(self, label, total, model)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per-model request counts, latency histogram, token totals and throughput"""
+        with self._lock:
+            records = list(self.records)
+            classes = dict(self.classes_completed)
+        elapsed_minutes = max((time.time() - self.started) / 60, 1e-9)
+
+        models: Dict[str, Dict[str, Any]] = {}
+        for r in records:
+            m = models.setdefault(r.model, _empty_model_summary())
+            m["requests"] += 1
+            m["latency_sum"] += r.latency
+            m["latencies"].append(r.latency)
+            if r.time_to_verdict is not None:
+                m["verdict_latencies"].append(r.time_to_verdict)
+            m["buckets"][bisect_left(LATENCY_BUCKETS, r.latency)] += 1
+            m["prompt_tokens"] += r.prompt_tokens or 0
+            m["cached_tokens"] += r.cached_tokens or 0
+            m["completion_tokens"] += r.completion_tokens or 0
+            m["outcomes"][r.outcome] += 1
+
+        for model in classes:
+            models.setdefault(model, _empty_model_summary())
+        for model, m in models.items():
+            m["classes"] = classes.get(model, 0)
+            m["classes_per_minute"] = m["classes"] / elapsed_minutes
+        return models
+
+    def print_summary(self):
+        print("Telemetry:")
+        for model, m in self.summary().items():
+            p50, p95 = percentile(m["latencies"], 50), percentile(m["latencies"], 95)
+            outcomes = ", ".join(f"{k}={v}" for k, v in sorted(m["outcomes"].items()))
+            print(f"  {model}: {m['requests']} requests ({outcomes}), latency p50 {p50:.2f}s p95 {p95:.2f}s, "
+                  f"tokens {m['prompt_tokens']} in / {m['completion_tokens']} out, "
+                  f"{m['classes']} classes ({m['classes_per_minute']:.1f}/min)")
+            if m["cached_tokens"]:
+                print(f"    prompt tokens served from the provider cache: {m['cached_tokens']} "
+                      f"({m['cached_tokens'] / max(m['prompt_tokens'], 1):.0%})")
+            if m["verdict_latencies"]:
+                print(f"    time to verdict (streaming): p50 {percentile(m['verdict_latencies'], 50):.2f}s "
+                      f"p95 {percentile(m['verdict_latencies'], 95):.2f}s")
+            histogram = " ".join(f"<={le:g}s:{n}" for le, n in zip(LATENCY_BUCKETS, m["buckets"]))
+            print(f"    latency histogram: {histogram} >{LATENCY_BUCKETS[-1]:g}s:{m['buckets'][-1]}")
+
+    def write_csv(self, path: str):
+        with self._lock:
+            records = list(self.records)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=[field.name for field in fields(RequestRecord)])
+            writer.writeheader()
+            writer.writerows(asdict(r) for r in records)
+        print(f"Request telemetry saved to {path} ({len(records)} requests)")
+
+    def write_prometheus(self, path: str):
+        """Write metrics in the Prometheus textfile-collector exposition format"""
+        lines = [
+            "# HELP llm_request_latency_seconds Latency of chat completion requests.",
+            "# TYPE llm_request_latency_seconds histogram",
+        ]
+        summary = self.summary()
+        for model, m in summary.items():
+            label = f'model="{_escape(model)}"'
+            cumulative = 0
+            for le, count in zip(LATENCY_BUCKETS, m["buckets"]):
+                cumulative += count
+                lines.append(f'llm_request_latency_seconds_bucket{{{label},le="{le:g}"}} {cumulative}')
+            lines.append(f'llm_request_latency_seconds_bucket{{{label},le="+Inf"}} {m["requests"]}')
+            lines.append(f"llm_request_latency_seconds_sum{{{label}}} {m['latency_sum']:.6f}")
+            lines.append(f"llm_request_latency_seconds_count{{{label}}} {m['requests']}")
+
+        lines += ["# HELP llm_requests_total Chat completion requests by outcome.",
+                  "# TYPE llm_requests_total counter"]
+        for model, m in summary.items():
+            for outcome, count in sorted(m["outcomes"].items()):
+                lines.append(f'llm_requests_total{{model="{_escape(model)}",outcome="{outcome}"}} {count}')
+
+        lines += ["# HELP llm_tokens_total Tokens reported in the response usage block.",
+                  "# TYPE llm_tokens_total counter"]
+        for model, m in summary.items():
+            lines.append(f'llm_tokens_total{{model="{_escape(model)}",type="prompt"}} {m["prompt_tokens"]}')
+            lines.append(f'llm_tokens_total{{model="{_escape(model)}",type="cached"}} {m["cached_tokens"]}')
+            lines.append(f'llm_tokens_total{{model="{_escape(model)}",type="completion"}} {m["completion_tokens"]}')
+
+        lines += ["# HELP llm_classes_per_minute Classes classified per minute since start.",
+                  "# TYPE llm_classes_per_minute gauge"]
+        for model, m in summary.items():
+            lines.append(f'llm_classes_per_minute{{model="{_escape(model)}"}} {m["classes_per_minute"]:.4f}')
+
+        # Write then rename so the node exporter never reads a half-written file
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(path + ".tmp", path)
+        print(f"Prometheus metrics saved to {path}")
+
+
+class ProgressTracker:
+    """Prints a progress line with throughput and ETA as classes complete"""
+
+    def __init__(self, telemetry: Telemetry, label: str, total: int, model: str):
+        self.telemetry = telemetry
+        self.label = label
+        self.total = total
+        self.model = model
+        self.done = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def tick(self, class_name: str = ""):
+        self.telemetry.class_completed(self.model)
+        with self._lock:
+            self.done += 1
+            done = self.done
+        elapsed = time.time() - self.started
+        rate = done / elapsed * 60 if elapsed > 0 else 0.0
+        remaining = (self.total - done) / (done / elapsed) if done and elapsed > 0 else 0.0
+        eta = time.strftime("%H:%M:%S", time.gmtime(remaining))
+        print(f"[PROGRESS] {self.label}: {done}/{self.total} ({done / max(self.total, 1):.0%}) "
+              f"{rate:.1f} classes/min, ETA {eta} {class_name}")
@@ -0,0 +1,31 @@
+from heuristics import ambiguous_columns, is_trivial_type, prelabel
+
+PRICE_CALCULATOR = """
+package shop;
+
+public class PriceCalculator {
+    enum Mode { NET, GROSS }
+
+    public double total(double net, double rate, Mode mode) {
+        return mode == Mode.GROSS ? net * (1 + rate) : net;
+    }
+}
+"""
+
+
+def test_nested_enum_is_not_a_trivial_type():
+    assert not is_trivial_type(PRICE_CALCULATOR)
+    assert ambiguous_columns(prelabel(PRICE_CALCULATOR))
+
+
+def test_type_keywords_in_strings_are_ignored():
+    code = 'public class Describer {\n    String text = "an enum Color or interface Shape";\n}\n'
+    assert not is_trivial_type(code)
+
+
+def test_top_level_trivial_types():
+    assert is_trivial_type("@Deprecated\npublic enum Mode { NET, GROSS }")
+    assert is_trivial_type("public interface Shape { double area(); }")
+    assert is_trivial_type("public @interface Marker {}")
+    assert is_trivial_type("public class ParseError extends RuntimeException {}")
+    assert not is_trivial_type("public class Parser extends AbstractParser { class Inner extends Error {} }")
@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class Endpoint:
+    """Health and latency bookkeeping for one chat completions URL"""
+
+    def __init__(self, url: str, window: int = 1000):
+        self.url = url
+        self.latencies = deque(maxlen=window)
+        self.ewma: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+    def record_success(self, latency: float):
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.latencies.append(latency)
+        self.ewma = latency if self.ewma is None else 0.8 * self.ewma + 0.2 * latency
+
+    def record_failure(self):
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+class Transport:
+    """Pooled keep-alive HTTP transport over one or more equivalent endpoints.
+
+    Requests go to the available endpoint with the fewest consecutive failures and,
+    among those, the lowest observed latency; endpoints that have not been measured
+    yet are tried first. After `max_failures` consecutive failures an endpoint is
+    ejected for `eject_seconds`. If every endpoint is ejected, the one due back
+    soonest is used.
+    """
+
+    def __init__(self, urls: List[str], headers: Optional[Dict[str, str]] = None, pool_size: int = 32,
+                 max_failures: int = 3, eject_seconds: float = 60.0):
+        if not urls:
+            raise ValueError("Transport needs at least one endpoint URL")
+
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(urls), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def choose_endpoint(self) -> Endpoint:
+        now = time.time()
+        with self._lock:
+            available = [e for e in self.endpoints if e.is_available(now)]
+            if not available:
+                return min(self.endpoints, key=lambda e: e.ejected_until)
+            return min(available, key=lambda e: (e.consecutive_failures, e.ewma is not None, e.ewma or 0.0))
+
+    def _record(self, endpoint: Endpoint, latency: Optional[float]):
+        with self._lock:
+            if latency is not None:
+                endpoint.record_success(latency)
+                return
+            endpoint.record_failure()
+            if endpoint.consecutive_failures >= self.max_failures:
+                endpoint.ejected_until = time.time() + self.eject_seconds
+                print(f"[WARN] Ejecting endpoint {endpoint.url} for {self.eject_seconds:.0f}s "
+                      f"after {endpoint.consecutive_failures} consecutive failures")
+
+    def post(self, json: Dict[str, Any], timeout: float = 30, **kwargs) -> requests.Response:
+        """POST to the best endpoint. 5xx responses and network errors count against it."""
+        endpoint = self.choose_endpoint()
+        start = time.perf_counter()
+        try:
+            response = self.session.post(endpoint.url, json=json, timeout=timeout, **kwargs)
+        except requests.exceptions.RequestException:
+            self._record(endpoint, None)
+            raise
+
+        if response.status_code >= 500:
+            self._record(endpoint, None)
+        else:
+            self._record(endpoint, time.perf_counter() - start)
+        return response
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{
+                "url": e.url,
+                "requests": e.requests,
+                "failures": e.failures,
+                "p50": percentile(list(e.latencies), 50),
+                "p95": percentile(list(e.latencies), 95),
+                "ejected": not e.is_available(time.time()),
+            } for e in self.endpoints]
+
+    def print_stats(self):
+        print("Endpoint latency:")
+        for s in self.stats():
+            status = " (ejected)" if s["ejected"] else ""
+            print(f"  {s['url']}: {s['requests']} requests, {s['failures']} failures, "
+                  f"p50 {s['p50']:.2f}s, p95 {s['p95']:.2f}s{status}")
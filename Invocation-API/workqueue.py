@@ -0,0 +1,305 @@
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import api
+from ingest import project_path
+from journal import ResultJournal, DEFAULT_JOURNAL_PATH
+
+DEFAULT_QUEUE_PATH = "work_queue.sqlite"
+LEASE_SECONDS = 300.0  # Long enough for one class including retries; renewed while the class is in flight
+MAX_ATTEMPTS = 3  # Leases granted per task before it is marked failed
+POLL_SECONDS = 5.0  # Idle workers check again this often while other workers hold leases
+
+
+class WorkQueue:
+    """SQLite table of (project, class, model) tasks claimed under time-limited leases.
+
+    A worker that dies simply stops renewing its leases; once they expire the tasks
+    are claimable again. Claims run in an immediate transaction, so two workers
+    never lease the same task. The file can live on a share every machine can reach,
+    provided the share supports file locking (SMB does; many NFS setups do not).
+
+    Source files are stored relative to their project directory, so a worker can
+    map a project to its own checkout path.
+    """
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH, lease_seconds: float = LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id INTEGER PRIMARY KEY, project TEXT, project_dir TEXT, rel_path TEXT, file_index INTEGER, "
+            "model TEXT, status TEXT DEFAULT 'pending', worker TEXT, lease_until REAL, "
+            "attempts INTEGER DEFAULT 0, result TEXT, updated REAL, UNIQUE (project, rel_path, model))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_until)")
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """One immediate (write-locked) transaction, so reads and updates inside it cannot interleave"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def enqueue(self, project_dir: str, model: str) -> int:
+        """Add a task for every class of the project not queued yet; returns the number added.
+
+        Tasks, journal records and result sheets are keyed by the project name (the last
+        part of the directory), so a second directory with the same name is rejected.
+        """
+        project = api.get_project_name(project_dir)
+        now = time.time()
+        files = api.get_java_files(project_dir)
+        with self._write() as conn:
+            queued = {d for d, in conn.execute("SELECT DISTINCT project_dir FROM tasks WHERE project = ?", (project,))}
+            others = sorted(d for d in queued if os.path.normpath(d) != os.path.normpath(project_dir))
+            if others:
+                raise ValueError(f"Project name '{project}' of {project_dir} is already queued for {others[0]}")
+            added = conn.executemany(
+                "INSERT OR IGNORE INTO tasks (project, project_dir, rel_path, file_index, model, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(project, project_dir, os.path.relpath(path, project_dir).replace(os.sep, "/"), index, model, now)
+                 for index, path in enumerate(files)]).rowcount
+        print(f"Queued {added} new tasks for {project} ({len(files)} classes, model {model})")
+        return added
+
+    def claim(self, worker: str, limit: int = 1, model: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Lease up to `limit` pending or expired tasks; tasks out of attempts are marked failed"""
+        now = time.time()
+        model_filter, params = ("AND model = ?", (model,)) if model else ("", ())
+        expired = "(status = 'pending' OR (status = 'leased' AND lease_until < ?))"
+        with self._write() as conn:
+            conn.execute(f"UPDATE tasks SET status = 'failed', worker = NULL, updated = ? "
+                         f"WHERE {expired} AND attempts >= ? {model_filter}", (now, now, self.max_attempts) + params)
+            rows = conn.execute(f"SELECT id, project, project_dir, rel_path, file_index, model, attempts FROM tasks "
+                                f"WHERE {expired} {model_filter} ORDER BY id LIMIT ?",
+                                (now,) + params + (limit,)).fetchall()
+            conn.executemany("UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?, "
+                             "attempts = attempts + 1, updated = ? WHERE id = ?",
+                             [(worker, now + self.lease_seconds, now, row[0]) for row in rows])
+        keys = ["id", "project", "project_dir", "rel_path", "file_index", "model", "attempts"]
+        return [dict(zip(keys, row)) for row in rows]
+
+    def renew(self, worker: str, task_ids: List[int]):
+        """Extend the leases this worker still holds"""
+        until = time.time() + self.lease_seconds
+        with self._write() as conn:
+            conn.executemany("UPDATE tasks SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                             [(until, task_id, worker) for task_id in task_ids])
+
+    def complete(self, task_id: int, row: List[Any]):
+        # Accepted even if the lease expired meanwhile: the verdict is valid and saves a repeat
+        with self._write() as conn:
+            conn.execute("UPDATE tasks SET status = 'done', lease_until = NULL, result = ?, updated = ? "
+                         "WHERE id = ? AND status != 'done'",
+                         (json.dumps(row, ensure_ascii=False), time.time(), task_id))
+
+    def release(self, task_id: int, worker: str):
+        """Give a task back after a failed classification; claim() fails it once out of attempts"""
+        with self._write() as conn:
+            conn.execute("UPDATE tasks SET status = 'pending', worker = NULL, lease_until = NULL, updated = ? "
+                         "WHERE id = ? AND worker = ? AND status = 'leased'", (time.time(), task_id, worker))
+
+    def requeue_failed(self) -> int:
+        with self._write() as conn:
+            return conn.execute("UPDATE tasks SET status = 'pending', attempts = 0, updated = ? "
+                                "WHERE status = 'failed'", (time.time(),)).rowcount
+
+    def outstanding(self, model: Optional[str] = None) -> int:
+        """Tasks not yet done or failed, including ones leased by other workers"""
+        model_filter, params = ("AND model = ?", (model,)) if model else ("", ())
+        return self._query(f"SELECT COUNT(*) FROM tasks WHERE status IN ('pending', 'leased') {model_filter}",
+                           params)[0][0]
+
+    def projects(self) -> List[Tuple[str, str]]:
+        """(project, model) pairs in the order they were queued"""
+        return self._query("SELECT project, model FROM tasks GROUP BY project, model ORDER BY MIN(id)")
+
+    def print_status(self, window: float = 600.0):
+        now = time.time()
+        print(f"Work queue {self.path}:")
+        for project, model, total, done, leased, expired, failed in self._query(
+                "SELECT project, model, COUNT(*), SUM(status = 'done'), "
+                "SUM(status = 'leased' AND lease_until >= ?), SUM(status = 'leased' AND lease_until < ?), "
+                "SUM(status = 'failed') FROM tasks GROUP BY project, model ORDER BY MIN(id)", (now, now)):
+            pending = total - done - leased - failed
+            print(f"  {project} [{model}]: {done}/{total} done ({done / total:.0%}), {leased} in flight, "
+                  f"{pending} pending ({expired} from expired leases), {failed} failed")
+
+        workers = self._query("SELECT worker, COUNT(*) FROM tasks WHERE status = 'leased' AND lease_until >= ? "
+                              "GROUP BY worker ORDER BY worker", (now,))
+        print(f"  Active workers: {len(workers)}" +
+              "".join(f"\n    {worker}: {count} tasks leased" for worker, count in workers))
+        recent, first = self._query("SELECT COUNT(*), MIN(updated) FROM tasks WHERE status = 'done' AND updated >= ?",
+                                    (now - window,))[0]
+        remaining = self.outstanding()
+        if recent and remaining:
+            rate = recent / max(now - first, 1.0) * 60
+            print(f"  Throughput: {rate:.1f} classes/min over the last {(now - first) / 60:.1f} min, "
+                  f"ETA {remaining / rate:.0f} min for {remaining} tasks")
+
+    def done_results(self, project: str, model: str) -> List[Tuple[str, str, int, List[Any]]]:
+        """(project_dir, rel_path, file_index, row) of every finished task of a project"""
+        return [(project_dir, rel_path, index, json.loads(result)) for project_dir, rel_path, index, result in
+                self._query("SELECT project_dir, rel_path, file_index, result FROM tasks "
+                            "WHERE project = ? AND model = ? AND status = 'done' ORDER BY file_index",
+                            (project, model))]
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def run_worker(queue: WorkQueue, journal: ResultJournal, local_dirs: Optional[Dict[str, str]] = None,
+               model: Optional[str] = None, concurrency: Optional[int] = None, use_cache: bool = True,
+               wait_for_others: bool = True) -> int:
+    """Claim and classify tasks until the queue is drained; returns the number completed.
+
+    `local_dirs` maps a project name to this machine's checkout when it differs from
+    the directory it was queued from. Journal records always use the queued path, so
+    every worker writes the same keys. Rate limits in SUPPORTED_MODELS apply per
+    worker process; lower rpm/tpm when several workers share one API key.
+    """
+    name = worker_name()
+    local_dirs = local_dirs or {}
+    in_flight: Dict[int, float] = {}
+    in_flight_lock = threading.Lock()
+    stop = threading.Event()
+    completed = 0
+
+    def heartbeat():
+        while not stop.wait(queue.lease_seconds / 3):
+            with in_flight_lock:
+                task_ids = list(in_flight)
+            if task_ids:
+                queue.renew(name, task_ids)
+
+    def process(task: Dict[str, Any]) -> bool:
+        local = project_path(local_dirs.get(task["project"], task["project_dir"]), task["rel_path"])
+        canonical = project_path(task["project_dir"], task["rel_path"])
+        with in_flight_lock:
+            in_flight[task["id"]] = time.time()
+        try:
+            if not os.path.exists(local):
+                print(f"  {name}: {local} not found on this machine, releasing task {task['id']}")
+                row = None
+            else:
+                row = api.classify_file(local, task["model"], use_cache)
+            if row:
+                api.record_result(journal, task["project"], task["model"], task["file_index"], canonical, row)
+                queue.complete(task["id"], row)
+            else:
+                queue.release(task["id"], name)
+            return bool(row)
+        except Exception as e:
+            # Hand the task back now rather than after its lease expires; the worker keeps going
+            print(f"  {name}: error processing task {task['id']} ({local}): {e}")
+            queue.release(task["id"], name)
+            return False
+        finally:
+            with in_flight_lock:
+                in_flight.pop(task["id"], None)
+
+    models = [model] if model else sorted({m for _, m in queue.projects()})
+    limit = concurrency or max(api.SUPPORTED_MODELS[m].max_concurrency for m in models)
+    print(f"Worker {name} started (concurrency {limit}, lease {queue.lease_seconds:g}s)")
+    threading.Thread(target=heartbeat, daemon=True).start()
+    try:
+        with ThreadPoolExecutor(max_workers=limit) as executor:
+            while True:
+                tasks = queue.claim(name, limit, model)
+                if not tasks:
+                    if wait_for_others and queue.outstanding(model):
+                        # Leases held by other workers; pick them up if those workers die
+                        time.sleep(POLL_SECONDS)
+                        continue
+                    break
+                completed += sum(executor.map(process, tasks))
+    finally:
+        stop.set()
+    print(f"Worker {name} finished: {completed} classes classified")
+    return completed
+
+
+def merge(queue: WorkQueue, journal: ResultJournal, output_excel: str):
+    """Export every queued project to its own sheet from the journal.
+
+    Finished tasks missing from the journal (e.g. a worker's journal on another
+    machine) are first copied in from the results stored in the queue.
+    """
+    queue.print_status()
+    by_model: Dict[str, List[str]] = {}
+    for project, model in queue.projects():
+        recorded = journal.project_records(project, model)
+        missing = [(d, rel, index, row) for d, rel, index, row in queue.done_results(project, model)
+                   if project_path(d, rel) not in recorded]
+        for project_dir, rel_path, index, row in missing:
+            api.record_result(journal, project, model, index, project_path(project_dir, rel_path), row)
+        if missing:
+            print(f"  Copied {len(missing)} results of {project} from the queue into {journal.path}")
+        by_model.setdefault(model, []).append(project)
+
+    for model, projects in by_model.items():
+        path = output_excel if len(by_model) == 1 else f"{os.path.splitext(output_excel)[0]}-{model}.xlsx"
+        journal.export_excel(path, projects, model)
+
+
+if __name__ == "__main__":
+    # Usage: python workqueue.py enqueue | worker | status | merge | requeue-failed
+    project_dirs = [
+        "E:\\unit-generate\\commons-csv\\src\\main\\java\\org\\apache\\commons\\csv",
+        "E:\\unit-generate\\commons-lang\\src\\main\\java\\org\\apache\\commons\\lang3",
+        "E:\\unit-generate\\google-json\\src\\main\\java\\com\\google\\gson",
+        "E:\\unit-generate\\commons-cli-evo\\src\\main\\java\\org\\apache\\commons\\cli",
+        "E:\\unit-generate\\ruler\\src\\main\\software\\amazon\\event\\ruler",
+        "D:\\restful-demo-1\\dat\\src\\main\\java\\net\\datafaker",
+        "E:\\unit-generate\\jfreechart154\\src\\main\\java\\org\\jfree"
+    ]
+    model = "gemini-2.5-flash-lite-preview-06-17"
+    output_excel = "gemini-14-classification_results.xlsx"
+
+    # Shared locations every worker can reach
+    QUEUE_PATH = DEFAULT_QUEUE_PATH
+    JOURNAL_PATH = DEFAULT_JOURNAL_PATH
+    # Project name -> checkout on this machine, when it differs from the queued path
+    LOCAL_DIRS = {}
+    CONCURRENCY = None
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    queue = WorkQueue(QUEUE_PATH)
+    if command == "enqueue":
+        for project_dir in project_dirs:
+            queue.enqueue(project_dir, model)
+    elif command == "worker":
+        if api.test_model_call(model):
+            run_worker(queue, ResultJournal(JOURNAL_PATH), LOCAL_DIRS, model, CONCURRENCY)
+            api.TELEMETRY.print_summary()
+    elif command == "status":
+        queue.print_status()
+    elif command == "merge":
+        merge(queue, ResultJournal(JOURNAL_PATH), output_excel)
+    elif command == "requeue-failed":
+        print(f"Requeued {queue.requeue_failed()} failed tasks")
+    else:
+        print(f"Unknown command '{command}', expected enqueue, worker, status, merge or requeue-failed")